@@ -15,12 +15,8 @@
 
 /usr/local/bin/docker-entrypoint.sh postgres &
 
-while [ "$(satellite schema-exists)" = "False" ]; do
-  sleep 1 # second
-done
+satellite wait-for-db || exit 1
 
 echo "database is up"
-satellite continuously-insert &
-satellite continuously-update &
-satellite continuously-delete &
+satellite run --health-port 8080 &
 wait
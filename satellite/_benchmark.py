@@ -0,0 +1,253 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import csv
+import math
+import logging
+import itertools
+
+from dataclasses import dataclass, asdict, fields
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from satellite._log import logger
+from satellite._schema import DatabaseSchema
+from satellite._tables import Tables
+
+SUPERCLASSES = ("none", "TemporalCore", "AuditCore")
+
+# Java types of the data columns of synthetic entities, used in turn
+_JAVA_TYPES = ("String", "Long", "Instant", "Boolean", "Double", "LocalDate", "byte[]")
+
+# Stages timed for each size of schema and data
+STAGES = ("parse", "sort", "generate", "emit")
+
+# Parameters that set the size of a benchmark
+PARAMETERS = ("n_tables", "n_columns", "n_rows")
+
+_CORE_CLASSES = {
+    "TemporalCore": (
+        "@MappedSuperclass\n"
+        "public abstract class TemporalCore<T extends TemporalCore<T, A>, "
+        "A extends AuditCore> {\n"
+        "    private Instant validFrom;\n"
+        "    private Instant storedFrom;\n"
+        "}\n"
+    ),
+    "AuditCore": (
+        "@MappedSuperclass\n"
+        "public abstract class AuditCore<T extends TemporalCore<T, ?>> "
+        "extends TemporalCore<T, AuditCore<T>> {\n"
+        "    private Instant validUntil;\n"
+        "    private Instant storedUntil;\n"
+        "}\n"
+    ),
+}
+
+
+def _entity_java(
+    name: str, referenced_names: List[str], n_columns: int, superclass: str
+) -> str:
+    extends = "" if superclass == "none" else f"extends {superclass}<{name}> "
+    lines = [
+        "@Entity",
+        "@Data",
+        f"public class {name} {extends}implements Serializable {{",
+        "    @Id",
+        "    @GeneratedValue(strategy = GenerationType.AUTO)",
+        f"    private Long {name[0].lower()}{name[1:]}Id;",
+    ]
+    for referenced_name in referenced_names:
+        attr_name = f"{referenced_name[0].lower()}{referenced_name[1:]}Id"
+        lines += [
+            "    @ManyToOne",
+            f'    @JoinColumn(name = "{attr_name}", nullable = false)',
+            f"    private {referenced_name} {attr_name};",
+        ]
+    for i in range(n_columns):
+        lines.append(f"    private {_JAVA_TYPES[i % len(_JAVA_TYPES)]} column{i};")
+
+    return "\n".join(lines + ["}"]) + "\n"
+
+
+def write_synthetic_entities(
+    directory: Path,
+    n_tables: int,
+    n_columns: int,
+    fk_depth: int = 2,
+    superclass: str = "AuditCore",
+) -> None:
+    """
+    Write Java entity classes that define a schema of n_tables tables, each with
+    n_columns data columns. Tables are split evenly over fk_depth + 1 levels and each
+    table references one in the level above, so the longest chain of foreign keys has
+    length fk_depth
+    """
+    if superclass not in SUPERCLASSES:
+        raise ValueError(f"Unknown superclass: {superclass}. Must be in {SUPERCLASSES}")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, java in _CORE_CLASSES.items():
+        (directory / f"{name}.java").write_text(java)
+
+    n_levels = min(fk_depth + 1, n_tables)
+    levels: List[List[str]] = [[] for _ in range(n_levels)]
+    for i in range(n_tables):
+        levels[i % n_levels].append(f"Entity{i}")
+
+    for depth, names in enumerate(levels):
+        for i, name in enumerate(names):
+            parents = levels[depth - 1] if depth > 0 else []
+            referenced_names = [parents[i % len(parents)]] if parents else []
+            java = _entity_java(name, referenced_names, n_columns, superclass)
+            (directory / f"{name}.java").write_text(java)
+
+
+@dataclass
+class BenchmarkResult:
+    """Seconds taken by each stage for one size of schema and data"""
+
+    n_tables: int
+    n_columns: int
+    n_rows: int
+    parse: float = 0.0
+    sort: float = 0.0
+    generate: float = 0.0
+    emit: float = 0.0
+
+
+def _benchmark(
+    n_tables: int, n_columns: int, n_rows: int, fk_depth: int, superclass: str
+) -> BenchmarkResult:
+    result = BenchmarkResult(n_tables=n_tables, n_columns=n_columns, n_rows=n_rows)
+
+    with TemporaryDirectory() as dir_name:
+        write_synthetic_entities(
+            Path(dir_name), n_tables, n_columns, fk_depth, superclass
+        )
+        start = perf_counter()
+        tables = Tables.from_directory(Path(dir_name))
+        result.parse = perf_counter() - start
+
+    start = perf_counter()
+    list(tables.topologically_sorted())
+    tables.topological_levels()
+    result.sort = perf_counter() - start
+
+    for table in tables:
+        table.n_rows = n_rows
+
+    start = perf_counter()
+    chunks = [table.fake_chunk(first_row=0, n_rows=n_rows) for table in tables]
+    result.generate = perf_counter() - start
+
+    schema = DatabaseSchema(
+        name="benchmark", tables=tables, database_name="benchmark", connect=False
+    )
+    start = perf_counter()
+    for chunk in chunks:
+        schema.add_data_command_for(chunk)
+    result.emit = perf_counter() - start
+    schema.close()
+
+    return result
+
+
+def run_benchmark(
+    n_tables: Iterable[int],
+    n_columns: Iterable[int],
+    n_rows: Iterable[int],
+    fk_depth: int = 2,
+    superclass: str = "AuditCore",
+) -> List[BenchmarkResult]:
+    """
+    Time parsing a synthetic schema, sorting its tables, generating data and emitting
+    the SQL to insert it, for every combination of the sizes. Logging below a warning
+    is suppressed while timing, as it would otherwise dominate
+    """
+    results = []
+    level = logger.level
+    try:
+        for sizes in itertools.product(n_tables, n_columns, n_rows):
+            logger.setLevel(logging.WARNING)
+            result = _benchmark(*sizes, fk_depth=fk_depth, superclass=superclass)
+            logger.setLevel(level)
+
+            logger.info(
+                f"{result.n_tables} tables, {result.n_columns} columns, "
+                f"{result.n_rows} rows: "
+                + ", ".join(
+                    f"{stage} {getattr(result, stage):.4f} s" for stage in STAGES
+                )
+            )
+            results.append(result)
+    finally:
+        logger.setLevel(level)
+
+    return results
+
+
+def _slope(points: List[Tuple[float, float]]) -> Optional[float]:
+    """Least squares gradient of log(y) against log(x)"""
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len({x for x, _ in points}) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / sum(
+        (x - mean_x) ** 2 for x, _ in points
+    )
+
+
+def scaling_exponents(
+    results: List[BenchmarkResult],
+) -> Dict[Tuple[str, str], float]:
+    """
+    Exponent k of time ~ size^k for each stage and size parameter, fitted to results
+    that differ only in that parameter. The largest over the other sizes is given, so
+    a value well above one flags superlinear scaling
+    """
+    exponents: Dict[Tuple[str, str], float] = dict()
+
+    for parameter in PARAMETERS:
+        others = [p for p in PARAMETERS if p != parameter]
+        groups: Dict[tuple, List[BenchmarkResult]] = dict()
+        for result in results:
+            key = tuple(getattr(result, p) for p in others)
+            groups.setdefault(key, []).append(result)
+
+        for stage in STAGES:
+            for group in groups.values():
+                slope = _slope(
+                    [(getattr(r, parameter), getattr(r, stage)) for r in group]
+                )
+                if slope is not None:
+                    exponents[(stage, parameter)] = max(
+                        slope, exponents.get((stage, parameter), -math.inf)
+                    )
+
+    return exponents
+
+
+def write_results(results: List[BenchmarkResult], filepath: Path) -> None:
+    """Write the results as a CSV file, with one row per size"""
+    with open(filepath, "w", newline="") as file:
+        writer = csv.DictWriter(
+            file, fieldnames=[f.name for f in fields(BenchmarkResult)]
+        )
+        writer.writeheader()
+        for result in results:
+            writer.writerow(asdict(result))
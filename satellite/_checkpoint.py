@@ -0,0 +1,55 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+from pathlib import Path
+from typing import Dict
+
+from satellite._log import logger
+
+
+class Checkpoint:
+    """
+    Progress of an incremental load, persisted as JSON. For each table the index of
+    the next row to generate is stored, so an interrupted load can be resumed with
+    the same fake data that would have been generated had it not been interrupted
+    """
+
+    def __init__(self, filepath: Path, key: str):
+        self._filepath = Path(filepath)
+        self._key = key  # Identifies the schema being loaded
+        self._data: Dict[str, Dict[str, int]] = dict()
+
+        if self._filepath.exists():
+            logger.info(f"Resuming from checkpoint {self._filepath}")
+            with open(self._filepath, "r") as file:
+                self._data = json.load(file)
+
+    @property
+    def _next_rows(self) -> Dict[str, int]:
+        return self._data.setdefault(self._key, dict())
+
+    def next_row(self, table_name: str, default: int) -> int:
+        """Index of the next row of a table to generate"""
+        return self._next_rows.get(table_name, default)
+
+    def update(self, table_name: str, next_row: int) -> None:
+        """Set the next row of a table and write the checkpoint atomically"""
+        self._next_rows[table_name] = next_row
+
+        tmp_filepath = self._filepath.with_suffix(".tmp")
+        with open(tmp_filepath, "w") as file:
+            json.dump(self._data, file)
+
+        tmp_filepath.replace(self._filepath)
@@ -0,0 +1,65 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+
+from time import monotonic
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Relative rate of activity on each day of the week (Monday first), averaging to 1
+_weekday_multipliers = (1.16, 1.16, 1.16, 1.16, 1.16, 0.6, 0.6)
+
+
+class SimulatedClock:
+    """
+    Clock that runs from a start time at a multiple of real time. Timestamps drawn
+    from it advance monotonically and activity follows daily and weekly cycles
+    """
+
+    def __init__(self, start: datetime, speed: float = 1.0):
+        self._start = start
+        self._speed = speed
+        self._real_start = monotonic()
+
+    @property
+    def speed(self) -> float:
+        """Number of simulated seconds per real second"""
+        return self._speed
+
+    def now(self) -> datetime:
+        elapsed_seconds = (monotonic() - self._real_start) * self._speed
+        return self._start + timedelta(seconds=elapsed_seconds)
+
+    def rate_multiplier(self, at: Optional[datetime] = None) -> float:
+        """
+        Relative rate of hospital activity at a time, which peaks in the early
+        afternoon, is lowest overnight and at weekends and averages to 1 over a week
+        """
+        at = self.now() if at is None else at
+        hour = at.hour + at.minute / 60
+        diurnal = 1.0 + 0.8 * math.cos(2 * math.pi * (hour - 14) / 24)
+        return diurnal * _weekday_multipliers[at.weekday()]
+
+
+_active_clock: Optional[SimulatedClock] = None
+
+
+def use_clock(clock: Optional[SimulatedClock]) -> None:
+    """Set the clock used to generate timestamps. None reverts to random times"""
+    global _active_clock
+    _active_clock = clock
+
+
+def active_clock() -> Optional[SimulatedClock]:
+    return _active_clock
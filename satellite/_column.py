@@ -11,17 +11,62 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import Optional, Callable, TYPE_CHECKING
+from typing import Optional, Callable, Any, Dict, Iterable, List, TYPE_CHECKING
 from dataclasses import dataclass
+from functools import cached_property
 
 from satellite._log import logger
-from satellite._fake import fake
+from satellite._fake import fake, _Faker
 
 
 if TYPE_CHECKING:
     from satellite._tables import Table
 
 
+_java_to_sql_type_map = {
+    "long": "bigint",
+    "string": "text",
+    "instant": "timestamptz",
+    "boolean": "boolean",
+    "double": "real",
+    "localdate": "date",
+    "byte[]": "bytea",
+}
+
+
+def _text_literal(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _datetime_literal(value: Any) -> str:
+    return "'" + value.isoformat() + "'"
+
+
+def _bytea_literal(value: Any) -> str:
+    return "'\\x" + value.hex() + "'"
+
+
+def _boolean_literal(value: Any) -> str:
+    return "true" if value else "false"
+
+
+# Types of column which are expensive to generate so may be sampled from pools. Not
+# timestamps, which may be drawn from a simulated clock
+_pooled_sql_types = ("text", "bytea")
+
+# Functions that serialise a non-null value of a postgres type as an SQL literal,
+# assuming standard_conforming_strings. Numeric types use the builtin conversions
+_sql_literal_functions: Dict[str, Callable[[Any], str]] = {
+    "bigint": str,
+    "real": repr,
+    "text": _text_literal,
+    "timestamptz": _datetime_literal,
+    "date": _datetime_literal,
+    "bytea": _bytea_literal,
+    "boolean": _boolean_literal,
+}
+
+
 @dataclass
 class Column:
     name: str
@@ -43,21 +88,11 @@ class Column:
             f"parent_table={self.parent_table_name}{suffix}"
         )
 
-    @property
+    @cached_property
     def sql_type(self) -> str:
 
-        java_to_sql_type_map = {
-            "long": "bigint",
-            "string": "text",
-            "instant": "timestamptz",
-            "boolean": "boolean",
-            "double": "real",
-            "localdate": "date",
-            "byte[]": "bytea",
-        }
-
-        if self.java_type.lower() in java_to_sql_type_map:
-            return java_to_sql_type_map[self.java_type.lower()]
+        if self.java_type.lower() in _java_to_sql_type_map:
+            return _java_to_sql_type_map[self.java_type.lower()]
         else:
             logger.error(
                 f"Failed to determine the derived type from {self.java_type} "
@@ -65,16 +100,15 @@ class Column:
             )
             return "text"
 
-    @property
-    def format_specifier(self) -> str:
-        if self.sql_type == "text":
-            return "'%s'"
-        elif self.sql_type == "timestamptz" or self.sql_type == "date":
-            return "timestamp '%s'"
-        elif self.sql_type == "bytea":
-            return "E'%s'"
+    @cached_property
+    def sql_literal(self) -> Callable[[Any], str]:
+        """Function to serialise a non-null value of this column as an SQL literal"""
+        return _sql_literal_functions[self.sql_type]
 
-        return "%s"
+    def sql_literals(self, values: Iterable) -> List[str]:
+        """SQL literals for a set of values of this column, any of which may be null"""
+        literal = self.sql_literal
+        return [literal(v) if v is not None else "null" for v in values]
 
     @property
     def is_foreign_key(self) -> bool:
@@ -84,11 +118,13 @@ class Column:
     def is_primary_key(self) -> bool:
         return self.name == f"{self.parent_table_name}_id"
 
-    def definition_in_schema(self, schema_name: str) -> str:
+    def definition_in_schema(
+        self, schema_name: str, with_references: bool = True
+    ) -> str:
         """Return a string containing the name, type and references to other tables"""
         ref_str = (
             ""
-            if self.table_reference is None
+            if self.table_reference is None or not with_references
             else f" REFERENCES {schema_name}.{self.table_reference.name}"
         )
         return f"{self.name} {self.sql_type}{ref_str}"
@@ -96,23 +132,56 @@ class Column:
     @property
     def faker_method(self) -> Callable:
         """Faker method to generate synthetic/fake values for this column"""
+        return self.faker_method_for(fake)
+
+    def faker_method_for(self, _fake: _Faker) -> Callable:
+        """Method of a specific faker instance to generate values for this column"""
+
+        if (method := _fake.column_methods.get(self, None)) is not None:
+            return method  # Resolving a method through the faker proxy is slow
+
+        method = self._provider_method_for(_fake)
+
+        if _fake.has_pools and self.sql_type in _pooled_sql_types:
+            method = _fake.pooled(method)
+
+        _fake.column_methods[self] = method
+        return method
+
+    @property
+    def provider_name(self) -> Optional[str]:
+        """
+        Name of the faker method that generates values for this column. Primary and
+        foreign keys are not generated by a provider so have no name
+        """
 
         if self.is_primary_key:
-            return lambda: None
+            return None
 
-        elif hasattr(fake, (tc_method_name := f"{self.parent_table_name}_{self.name}")):
+        elif hasattr(fake, (tc_method := f"{self.parent_table_name}_{self.name}")):
             # match for a column in a defined table
-            return getattr(fake, tc_method_name)
+            return tc_method
 
         elif hasattr(fake, self.name):  # match for specific column e.g. mrn
-            return getattr(fake, self.name)
+            return self.name
 
         elif self.is_foreign_key:
-            return lambda: fake.pyint(1, self.table_reference.n_rows)  # type: ignore
+            return None
 
         elif hasattr(fake, self.sql_type):  # match for the type of column
-            return getattr(fake, self.sql_type)
+            return self.sql_type
 
         else:
             logger.error(f"Have no provider for {self.sql_type}")
-            return fake.default
+            return "default"
+
+    def _provider_method_for(self, _fake: _Faker) -> Callable:
+
+        if self.is_primary_key:
+            return lambda: None
+
+        elif (name := self.provider_name) is not None:
+            return getattr(_fake, name)
+
+        else:
+            return lambda: self.table_reference.random_id(_fake)  # type: ignore
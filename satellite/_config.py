@@ -0,0 +1,100 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import sys
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from satellite._log import logger
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+
+class WorkloadConfig:
+    """
+    Rates of operations and maximum number of rows for each table, defined in a
+    TOML file. For example:
+
+        [defaults]
+        insert_rate = 1.0      # rows per second for each table
+        max_num_rows = 100000
+
+        [totals]
+        update_rate = 20.0     # rows per second shared across tables by weight
+
+        [tables.visit_observation]
+        insert_rate = 50.0
+        update_weight = 10.0
+        max_num_rows = 10000000
+
+    A rate defined for a table takes precedence over a total, which takes precedence
+    over a default. Weights default to 1
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self._defaults: Dict[str, Any] = data.get("defaults", dict())
+        self._totals: Dict[str, Any] = data.get("totals", dict())
+        self._tables: Dict[str, Dict[str, Any]] = data.get("tables", dict())
+
+    @classmethod
+    def from_file(cls, filepath: Path) -> "WorkloadConfig":
+        logger.info(f"Loading workload configuration from {filepath}")
+        with open(filepath, "rb") as file:
+            return cls(tomllib.load(file))
+
+    def check_table_names(self, table_names: Iterable[str]) -> None:
+        """Warn about any configured tables that are not present in the schema"""
+        for name in set(self._tables) - set(table_names):
+            logger.warning(f"Configured table {name} is not present in the schema")
+
+    def _table_value(self, table_name: str, key: str) -> Optional[Any]:
+        return self._tables.get(table_name, dict()).get(key, None)
+
+    def rate(
+        self,
+        table_name: str,
+        operation: str,
+        table_names: Iterable[str],
+        default: float = 0.0,
+    ) -> float:
+        """Rate of an operation on a table in rows per second"""
+        key = f"{operation}_rate"
+
+        if (rate := self._table_value(table_name, key)) is not None:
+            return float(rate)
+
+        if key in self._totals:
+            # Shared by weight between tables without their own rate
+            weights = {
+                name: 1.0
+                if (w := self._table_value(name, f"{operation}_weight")) is None
+                else float(w)
+                for name in table_names
+                if self._table_value(name, key) is None
+            }
+            if (total_weight := sum(weights.values())) == 0:
+                return 0.0
+            return float(self._totals[key]) * weights[table_name] / total_weight
+
+        return float(self._defaults.get(key, default))
+
+    def max_num_rows(self, table_name: str, default: float) -> float:
+        """Number of rows in a table above which no more are inserted"""
+        if (value := self._table_value(table_name, "max_num_rows")) is not None:
+            return float(value)
+
+        return float(self._defaults.get("max_num_rows", default))
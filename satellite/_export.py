@@ -0,0 +1,120 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import csv
+
+from pathlib import Path
+from typing import Any, Generator
+
+from satellite._log import logger
+from satellite._output import open_output, suffix_for
+from satellite._tables import Table, _TableChunk
+
+FORMATS = ("csv", "parquet")
+
+
+def _arrow() -> Any:
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "Exporting parquet requires the pyarrow package. "
+            "Install it with: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+def _arrow_type_for(sql_type: str) -> Any:
+    pa = _arrow()
+    return {
+        "bigint": pa.int64(),
+        "text": pa.string(),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+        "boolean": pa.bool_(),
+        "real": pa.float32(),
+        "date": pa.date32(),
+        "bytea": pa.binary(),
+    }[sql_type]
+
+
+def _chunks(table: Table, chunk_size: int) -> Generator[_TableChunk, None, None]:
+    """
+    Chunks of all the rows of a table, including the primary keys 1...n_rows that
+    rows would have if inserted into an empty table. Foreign keys reference these
+    """
+    for first_row in range(0, table.n_rows, chunk_size):
+        n_rows = min(chunk_size, table.n_rows - first_row)
+        chunk = table.fake_chunk(first_row, n_rows)
+        chunk[chunk.pk_column] = list(range(first_row + 1, first_row + n_rows + 1))
+        yield chunk
+
+
+def _csv_value(value: Any) -> Any:
+    """Value as written to a CSV file, which postgres can COPY from"""
+    return "\\x" + value.hex() if isinstance(value, bytes) else value
+
+
+def _export_csv(
+    table: Table, filepath: Path, compression: str, chunk_size: int
+) -> None:
+    with open_output(filepath, compression) as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow([column.name for column in table.columns])
+
+        for chunk in _chunks(table, chunk_size):
+            columns = [[_csv_value(v) for v in chunk[c]] for c in table.columns]
+            writer.writerows(zip(*columns))
+
+
+def _export_parquet(
+    table: Table, filepath: Path, compression: str, chunk_size: int
+) -> None:
+    pa = _arrow()
+    schema = pa.schema(
+        [(column.name, _arrow_type_for(column.sql_type)) for column in table.columns]
+    )
+
+    with pa.parquet.ParquetWriter(filepath, schema, compression=compression) as writer:
+        for chunk in _chunks(table, chunk_size):  # Each chunk is a row group
+            arrays = [
+                pa.array(chunk[column], type=field.type)
+                for column, field in zip(table.columns, schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def export_table(
+    table: Table,
+    directory: Path,
+    file_format: str,
+    compression: str = "none",
+    chunk_size: int = 100_000,
+) -> Path:
+    """
+    Write all the rows of fake data of a table to a file in a directory, generating
+    chunk_size rows at a time. The data are those inserted by populate
+    """
+    if file_format == "csv":
+        filepath = directory / f"{table.name}.csv{suffix_for(compression)}"
+        _export_csv(table, filepath, compression, chunk_size)
+
+    elif file_format == "parquet":
+        filepath = directory / f"{table.name}.parquet"
+        _export_parquet(table, filepath, compression, chunk_size)
+
+    else:
+        raise ValueError(f"Unknown format: {file_format}. Must be in {FORMATS}")
+
+    logger.info(f"Exported {table.n_rows} rows of {table.name} to {filepath}")
+    return filepath
@@ -11,15 +11,24 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+import json
 import faker
+import hashlib
+import tempfile
+import threading
 
-from typing import Any, Optional, Dict
+from pathlib import Path
+from typing import Any, Optional, Dict, Callable, List, Tuple
 from datetime import datetime, date, timedelta
 from faker.providers import BaseProvider
 from faker.providers.person.en import Provider as PersonProvider
 from faker.providers.address.en import Provider as AddressProvider
 from faker.providers.date_time import Provider as FakerDTProvider
 from satellite._settings import EnvVar
+from satellite._clock import active_clock
+from satellite._log import logger
+from satellite._utils import to_json_value, from_json_value
 
 _ETHNICITIES = [
     "Black African",
@@ -131,13 +140,13 @@ class _StarBaseProvider(BaseProvider):
 
 class _StarPersonProvider(PersonProvider, _StarBaseProvider):
     def firstname(self) -> str:
-        return self.first_name().replace("'", " ")
+        return self.first_name()
 
     def middlename(self) -> Optional[str]:
         return self._value_or_none(self.firstname(), p=0.5)
 
     def lastname(self) -> str:
-        return self.last_name().replace("'", " ")
+        return self.last_name()
 
     def name(self) -> str:
         return self.text()
@@ -149,9 +158,13 @@ class _StarPersonProvider(PersonProvider, _StarBaseProvider):
 
 class _StarDatetimeProvider(FakerDTProvider, _StarBaseProvider):
     def timestamptz(self) -> datetime:
-        return self.date_time()
+        clock = active_clock()
+        return self.date_time() if clock is None else clock.now()
 
     def _recent_datetime(self) -> datetime:
+        if (clock := active_clock()) is not None:
+            return clock.now()
+
         delta_time = timedelta(
             seconds=self.unix_time(
                 start_datetime=datetime(2018, 1, 1), end_datetime=datetime(2023, 1, 1)
@@ -177,6 +190,23 @@ class _StarDatetimeProvider(FakerDTProvider, _StarBaseProvider):
     def discharge_datetime(self) -> Optional[datetime]:
         return self._value_or_none(self._recent_datetime(), p=0.1)
 
+    def visit_observation_batch(self, n: int) -> Dict[str, list]:
+        """Columns of n rows, with the same values as n calls to visit_observation"""
+        texts: List[Optional[str]] = [None] * n
+        reals: List[Optional[float]] = [None] * n
+        dates: List[Optional[date]] = [None] * n
+
+        for i in range(n):
+            rand_float = self.generator.random.random()
+            if rand_float < 0.2:
+                texts[i] = self.text()
+            elif rand_float < 0.8:
+                reals[i] = self.real()
+            else:
+                dates[i] = self.date()
+
+        return {"value_as_text": texts, "value_as_real": reals, "value_as_date": dates}
+
     def visit_observation(self) -> dict:
 
         rand_float = self.generator.random.random()  # in [0, 1)
@@ -195,8 +225,37 @@ class _StarDatetimeProvider(FakerDTProvider, _StarBaseProvider):
 
         return data
 
+    def _current_hospital_visit(self, now: datetime) -> dict:
+        """Visit of a patient who presented in the last day"""
+
+        presentation_datetime = now - timedelta(
+            hours=self.generator.random.uniform(0, 24)
+        )
+        admission_datetime = (
+            presentation_datetime
+            + (now - presentation_datetime) * self.generator.random.random()
+        )
+        return {
+            "presentation_datetime": presentation_datetime,
+            "admission_datetime": admission_datetime,
+            "discharge_datetime": None,
+        }
+
+    def hospital_visit_update(self) -> dict:
+        """
+        Updated hospital visit. With a simulated clock the patient is discharged and
+        the rest of the visit is unchanged
+        """
+        if (clock := active_clock()) is not None:
+            return {"discharge_datetime": clock.now()}
+
+        return self.hospital_visit()
+
     def hospital_visit(self) -> dict:
 
+        if (clock := active_clock()) is not None:
+            return self._current_hospital_visit(clock.now())
+
         start_datetime = datetime(2018, 1, 1)
         end_datetime = datetime(2023, 1, 1)
 
@@ -220,6 +279,42 @@ class _StarDatetimeProvider(FakerDTProvider, _StarBaseProvider):
         }
         return data
 
+    def hospital_visit_batch(self, n: int) -> Dict[str, list]:
+        """Columns of n rows, with the same values as n calls to hospital_visit"""
+        data: Dict[str, list] = {
+            "presentation_datetime": [],
+            "admission_datetime": [],
+            "discharge_datetime": [],
+        }
+
+        if active_clock() is not None:
+            rows = [self.hospital_visit() for _ in range(n)]
+            return {key: [row[key] for row in rows] for key in data}
+
+        start_datetime = datetime(2018, 1, 1)
+        end_datetime = datetime(2023, 1, 1)
+
+        max_seconds = (end_datetime.timestamp() - start_datetime.timestamp()) / 3
+        uniform, random = self.generator.random.uniform, self.generator.random.random
+
+        for _ in range(n):
+            presentation_datetime = start_datetime + timedelta(
+                seconds=uniform(0, max_seconds)
+            )
+            admission_datetime = presentation_datetime + timedelta(
+                seconds=uniform(0, max_seconds)
+            )
+            discharge_datetime = admission_datetime + timedelta(
+                seconds=uniform(0, max_seconds)
+            )
+            data["presentation_datetime"].append(presentation_datetime)
+            data["admission_datetime"].append(admission_datetime)
+            data["discharge_datetime"].append(
+                discharge_datetime if random() > 0.2 else None
+            )
+
+        return data
+
 
 class _StarAddressProvider(AddressProvider):
     def home_postcode(self) -> str:
@@ -234,21 +329,167 @@ _providers = (
 )
 
 
+# Columns changed by an update with a simulated clock, so the history of the rest of
+# the row is kept. All the data columns of other tables are updated
+_CLOCKED_UPDATE_COLUMNS = {"hospital_visit": ("discharge_datetime",)}
+
+# Providers of identifiers, which would no longer be distinct if sampled from a pool
+_UNPOOLED_PROVIDERS = ("mrn", "nhs_number", "encounter")
+
+
+class _ValuePool:
+    """
+    Bounded pool of values pre-generated by a provider method, from which values are
+    sampled by index. A small fraction of samples replace the least recently
+    generated value in the pool, so the values available change over time
+    """
+
+    def __init__(
+        self,
+        method: Callable,
+        values: List[Any],
+        random: Any,
+        refresh_probability: float = 0.01,
+    ):
+        self._method = method
+        self._values = values
+        self._random = random
+        self._refresh_probability = refresh_probability
+        self._oldest_idx = 0
+
+    @property
+    def values(self) -> List[Any]:
+        return self._values
+
+    def __call__(self) -> Any:
+        if self._random.random() < self._refresh_probability:
+            self._values[self._oldest_idx] = self._method()
+            self._oldest_idx = (self._oldest_idx + 1) % len(self._values)
+
+        return self._values[int(self._random.random() * len(self._values))]
+
+
 class _Faker(faker.Faker):
     """Custom Faker"""
 
-    def __init__(self, *args: Any, **kwargs: Any):
+    def __init__(
+        self,
+        *args: Any,
+        pool_size: int = 0,
+        pool_path: Optional[str] = None,
+        **kwargs: Any,
+    ):
         super().__init__(*args, **kwargs)
 
         for provider in _providers:
             self.add_provider(provider)
 
+        self._pool_size = pool_size
+        self._pool_path = None if pool_path is None else Path(pool_path)
+        self._pools: Dict[str, _ValuePool] = dict()
+        self._pool_values: Dict[str, List[Any]] = dict()  # Loaded from a file
+        self.column_methods: Dict[Any, Callable] = dict()  # Resolved for columns
+
+        if self._pool_path is not None and self._pool_path.exists():
+            logger.info(f"Loading pools of fake values from {self._pool_path}")
+            with open(self._pool_path, "r") as file:
+                self._pool_values = {
+                    name: [from_json_value(value) for value in values]
+                    for name, values in json.load(file).items()
+                }
+
     @classmethod
-    def with_seed(cls, seed: int) -> "_Faker":
+    def with_seed(cls, seed: int, **kwargs: Any) -> "_Faker":
         """Faker instance with a defined seed"""
-        _fake = cls()
+        _fake = cls(**kwargs)
         cls.seed(seed)  # Note: cannot set on an instance
         return _fake
 
+    @staticmethod
+    def updated_column_names(table_name: str) -> Optional[Tuple[str, ...]]:
+        """Names of the columns changed by an update, or None if all data columns are"""
+        if active_clock() is None:
+            return None
+
+        return _CLOCKED_UPDATE_COLUMNS.get(table_name, None)
+
+    @property
+    def has_pools(self) -> bool:
+        """Are values from expensive methods sampled from pre-generated pools?"""
+        return self._pool_size > 0
+
+    def pooled(self, method: Callable) -> Callable:
+        """
+        Function that samples values from a pool generated by a provider method.
+        Identifiers are not pooled, so the method is returned
+        """
+        name = method.__name__
+        if name in _UNPOOLED_PROVIDERS:
+            return method
+
+        if name not in self._pools:
+            values = self._pool_values.get(name, [])[: self._pool_size]
+            n_new_values = self._pool_size - len(values)
+
+            if n_new_values > 0:
+                logger.info(f"Generating a pool of {self._pool_size} {name} values")
+                values += [method() for _ in range(n_new_values)]
+
+            self._pools[name] = _ValuePool(method, values, random=self.random)
+            if len(self._pool_values.get(name, [])) != len(values):  # New or resized
+                self._pool_values[name] = list(values)
+                self._save_pools()
+
+        return self._pools[name]
+
+    def _save_pools(self) -> None:
+        """Write all the pools to the file atomically, so readers never see a part"""
+        if self._pool_path is None:
+            return
 
-fake = _Faker.with_seed(EnvVar("FAKER_SEED").unwrap_as(int))
+        data = {
+            name: [to_json_value(value) for value in values]
+            for name, values in self._pool_values.items()
+        }
+        fd, temp_path = tempfile.mkstemp(
+            dir=self._pool_path.parent, prefix=f".{self._pool_path.name}."
+        )
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file)
+            os.replace(temp_path, self._pool_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+_seed = EnvVar("FAKER_SEED").unwrap_as(int)
+_local = threading.local()
+
+
+def derived_seed(*keys: Any) -> int:
+    """
+    Seed derived from FAKER_SEED and a set of keys e.g. a table name, column name
+    and chunk index. Each combination of keys defines an independent random stream
+    """
+    key = repr((_seed,) + keys).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def fake_stream(*keys: Any) -> _Faker:
+    """
+    Faker seeded for a stream defined by a set of keys. The instance is local to the
+    thread and is re-seeded by the next call, so values must be drawn before then
+    """
+    if not hasattr(_local, "fake"):
+        _local.fake = _Faker()
+
+    _local.fake.seed_instance(derived_seed(*keys))
+    return _local.fake
+
+
+fake = _Faker.with_seed(
+    _seed,
+    pool_size=int(EnvVar("FAKER_POOL_SIZE").or_default()),
+    pool_path=EnvVar("FAKER_POOL_PATH").or_else(None),
+)
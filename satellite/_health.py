@@ -0,0 +1,57 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict
+
+from satellite._log import logger
+
+# Function returning the current state, which must be safe to call from any thread
+StateFunction = Callable[[], Dict[str, Any]]
+
+
+def _handler_for(state: StateFunction) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") != "/health":
+                self.send_error(404)
+                return
+
+            current_state = state()
+            body = json.dumps(current_state).encode()
+            self.send_response(200 if current_state.get("running", False) else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format % args)
+
+    return Handler
+
+
+def serve_health(port: int, state: StateFunction) -> ThreadingHTTPServer:
+    """
+    Serve the state as JSON at /health on a port, from a background thread. The
+    status is 200 while the state is running and 503 otherwise
+    """
+    server = ThreadingHTTPServer(("", port), _handler_for(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    logger.info(f"Serving health checks on port {server.server_port}")
+    return server
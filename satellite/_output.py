@@ -0,0 +1,77 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import io
+import sys
+import gzip
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Generator, IO, Optional, TextIO
+
+# Size of the buffer written to the underlying file or pipe in one go
+_BUFFER_SIZE = 1024**2
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+def suffix_for(compression: str) -> str:
+    """File suffix appended for a type of compression"""
+    return {"none": "", "gzip": ".gz", "zstd": ".zst"}[compression]
+
+
+def _compressed(fileobj: IO[bytes], compression: str) -> Any:
+    if compression == "none":
+        return fileobj
+
+    elif compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=6)
+
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError(
+                "zstd compression requires the zstandard package. "
+                "Install it with: pip install zstandard"
+            ) from e
+        return zstandard.ZstdCompressor().stream_writer(
+            fileobj, closefd=False, write_return_read=True
+        )
+
+    raise ValueError(f"Unknown compression: {compression}. Must be in {COMPRESSIONS}")
+
+
+@contextmanager
+def open_output(
+    filepath: Optional[Path], compression: str = "none"
+) -> Generator[TextIO, None, None]:
+    """
+    Open a text stream that writes, in buffered chunks and optionally compressed, to
+    a file or to stdout if the filepath is undefined
+    """
+    if filepath is None:
+        sys.stdout.flush()
+        fileobj = open(sys.stdout.fileno(), "wb", buffering=0, closefd=False)
+    else:
+        fileobj = open(filepath, "wb", buffering=0)
+
+    writer = io.TextIOWrapper(
+        io.BufferedWriter(_compressed(fileobj, compression), buffer_size=_BUFFER_SIZE),
+        encoding="utf-8",
+    )
+    try:
+        yield writer
+    finally:
+        writer.close()  # Also ends any compressed stream
+        fileobj.close()
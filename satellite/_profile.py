@@ -0,0 +1,190 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import sys
+import signal
+import cProfile
+import threading
+
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional
+
+from satellite._log import logger
+
+PROFILERS = ("sample", "cprofile")
+
+
+class PhaseTimers:
+    """Total wall time and number of calls of named phases of work, if enabled"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.totals: Dict[str, float] = dict()
+        self.n_calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.totals.clear()
+            self.n_calls.clear()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.n_calls[name] += 1
+
+    def summary(self) -> str:
+        lines = [f"{'phase':<20} {'calls':>10} {'total/s':>10} {'mean/ms':>10}"]
+        for name, total in sorted(self.totals.items(), key=lambda x: -x[1]):
+            n = self.n_calls[name]
+            lines.append(f"{name:<20} {n:>10} {total:>10.3f} {1e3 * total / n:>10.3f}")
+        return "\n".join(lines)
+
+
+timers = PhaseTimers()
+
+
+class phase:
+    """
+    Context manager timing a named phase of work. Phases may be nested, in which case
+    the time of the inner phase is also included in that of the outer one
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        if timers.enabled:
+            self.start = perf_counter()
+
+    def __exit__(self, *args: Any) -> None:
+        if timers.enabled:
+            timers.add(self.name, perf_counter() - self.start)
+
+
+def timed(name: str) -> Callable:
+    """Decorator timing each call of a function as a named phase"""
+
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not timers.enabled:
+                return function(*args, **kwargs)
+
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    """Thread that periodically samples the stacks of all other threads"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="satellite-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+
+                names: List[str] = []
+                current: Optional[FrameType] = frame
+                while current is not None:
+                    names.append(_frame_name(current))
+                    current = current.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class Profile:
+    """
+    Profile of this process, along with timers of each phase of work. The sample
+    profiler writes stacks in the collapsed format read by e.g. flamegraph.pl or
+    speedscope, and cprofile writes pstats output read by e.g. snakeviz
+    """
+
+    def __init__(
+        self, filepath: Path, profiler: str = "sample", interval: float = 0.005
+    ):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler}. Must be in {PROFILERS}")
+
+        self.filepath = filepath
+        self.profiler = profiler
+        self.interval = interval
+        self._pid = os.getpid()
+        self._sampler: Optional[_Sampler] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._sigterm_handler: Any = None
+
+    def start(self) -> None:
+        timers.reset()
+        timers.enabled = True
+        # Exit normally on SIGTERM, e.g. from docker stop, so the profile is written
+        self._sigterm_handler = signal.signal(signal.SIGTERM, self._exit)
+
+        if self.profiler == "sample":
+            self._sampler = _Sampler(self.interval)
+            self._sampler.start()
+        else:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def _exit(self, signum: int, frame: Any) -> None:
+        if os.getpid() != self._pid:  # Forked worker processes terminate as usual
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTERM)
+            return
+        raise SystemExit(0)
+
+    def stop(self) -> None:
+        timers.enabled = False
+        if self._sigterm_handler is not None:
+            signal.signal(signal.SIGTERM, self._sigterm_handler)
+            self._sigterm_handler = None
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            with open(self.filepath, "w") as file:
+                for stack, count in self._sampler.stacks.items():
+                    print(f"{stack} {count}", file=file)
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.filepath)
+
+        logger.info(f"Wrote {self.profiler} profile to {self.filepath}")
+        logger.info(f"Time spent in each phase:\n{timers.summary()}")
@@ -0,0 +1,245 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+import threading
+
+from collections import Counter
+from time import monotonic, perf_counter
+from typing import Dict, List, NamedTuple, Optional
+
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from satellite._log import logger
+from satellite._fake import fake_stream
+from satellite._schema import DatabaseSchema
+from satellite._tables import Table, Tables
+
+
+class ReadQuery(NamedTuple):
+    """Parameterised query reading rows given a primary key of a table"""
+
+    name: str
+    sql: str
+    table: Table  # Table with the primary key used as the parameter
+
+
+def read_queries_for(
+    schema_name: str, tables: Tables, child_limit: int = 100
+) -> List[ReadQuery]:
+    """
+    Point lookups of each table by primary key, and joins along each foreign key
+    from a child row to its parent and from a parent row to at most child_limit of
+    its children
+    """
+    queries = []
+
+    for table in tables:
+        queries.append(
+            ReadQuery(
+                name=f"{table.name} by id",
+                sql=f"SELECT * FROM {schema_name}.{table.name} "
+                f"WHERE {table.primary_key_name} = %s",
+                table=table,
+            )
+        )
+
+    for table in tables:
+        for column in table.foreign_key_columns:
+            parent: Table = column.table_reference  # type: ignore
+            join = (
+                f"SELECT * FROM {schema_name}.{table.name} AS child "
+                f"JOIN {schema_name}.{parent.name} AS parent "
+                f"ON child.{column.name} = parent.{parent.primary_key_name}"
+            )
+            queries += [
+                ReadQuery(
+                    name=f"{table.name} -> {parent.name}",
+                    sql=f"{join} WHERE child.{table.primary_key_name} = %s",
+                    table=table,
+                ),
+                ReadQuery(
+                    name=f"{parent.name} <- {table.name}",
+                    sql=f"{join} WHERE parent.{parent.primary_key_name} = %s "
+                    f"LIMIT {int(child_limit)}",
+                    table=parent,
+                ),
+            ]
+
+    return queries
+
+
+class LatencyHistogram:
+    """
+    Number of latencies in logarithmic buckets, each 5% wider than the last, so
+    memory is bounded and percentiles are accurate to within 5%
+    """
+
+    _base = 1.05
+
+    def __init__(self) -> None:
+        self.counts: Counter = Counter()
+        self.n = 0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        microseconds = max(seconds * 1e6, 1.0)
+        self.counts[int(math.log(microseconds, self._base))] += 1
+        self.n += 1
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts.update(other.counts)
+        self.n += other.n
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the q-th percentile latency, in seconds"""
+        rank, n_below = math.ceil(q / 100 * self.n), 0
+
+        for bucket in sorted(self.counts):
+            n_below += self.counts[bucket]
+            if n_below >= rank:
+                return min(self._base ** (bucket + 1) / 1e6, self.max)
+
+        return self.max
+
+
+class ReadWorkload:
+    """
+    Read queries run concurrently by threads sharing a pool of connections, each as
+    fast as possible or at a share of a total rate. Query parameters are primary keys
+    of random rows. The latency percentiles of each query are reported periodically
+    """
+
+    def __init__(
+        self,
+        schema: DatabaseSchema,
+        n_threads: int = 4,
+        rate: float = 0.0,
+        report_interval: float = 10.0,
+        child_limit: int = 100,
+    ):
+        self._schema = schema
+        self._queries = read_queries_for(
+            schema.schema_name, schema.tables, child_limit=child_limit
+        )
+        self._n_threads = n_threads
+        self._rate = rate  # Total queries per second, unlimited if zero
+        self._report_interval = report_interval
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._interval_latencies: Dict[str, LatencyHistogram] = dict()
+        self.latencies: Dict[str, LatencyHistogram] = dict()  # Keyed on query name
+        self.n_errors: Counter = Counter()
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Run the readers for a duration in seconds, or forever if undefined"""
+        self._schema.update_num_rows_in_tables()
+        pool = self._schema.connection_pool(self._n_threads)
+        threads = [
+            threading.Thread(target=self._read, args=(pool, i), daemon=True)
+            for i in range(self._n_threads)
+        ]
+        for thread in threads:
+            thread.start()
+
+        start_time = report_time = monotonic()
+        end_time = float("inf") if duration is None else start_time + duration
+        try:
+            while not self._stop.wait(
+                min(self._report_interval, max(end_time - monotonic(), 0.0))
+            ):
+                now = monotonic()
+                self._report(seconds=now - report_time)
+                report_time = now
+
+                if now >= end_time:
+                    break
+                self._schema.update_num_rows_in_tables()
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            pool.closeall()
+
+        logger.info("Latencies over the whole run:")
+        self._log(self.latencies, seconds=monotonic() - start_time)
+
+    def _read(self, pool: ThreadedConnectionPool, index: int) -> None:
+        _fake = fake_stream("reader", index)
+        interval = 0.0 if self._rate <= 0 else self._n_threads / self._rate
+        next_time = monotonic()
+
+        while not self._stop.is_set():
+            query = self._queries[_fake.random.randrange(len(self._queries))]
+            if (_id := query.table.random_id(_fake)) is None:
+                self._stop.wait(0.1)  # Empty table
+                continue
+
+            connection = None
+            try:
+                connection = pool.getconn()
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    start = perf_counter()
+                    cursor.execute(query.sql, (_id,))
+                    cursor.fetchall()
+                    latency = perf_counter() - start
+                pool.putconn(connection)
+            except Exception as e:  # Including pool errors, so the thread continues
+                logger.warning(f"Failed to read {query.name} due to:\n{e}")
+                if connection is not None:
+                    pool.putconn(connection, close=bool(connection.closed))
+                with self._lock:
+                    self.n_errors[query.name] += 1
+                self._stop.wait(0.1 if isinstance(e, PoolError) else 0)
+                continue
+
+            with self._lock:
+                self._interval_latencies.setdefault(query.name, LatencyHistogram()).add(
+                    latency
+                )
+
+            if interval > 0:
+                next_time += interval
+                if (delay := next_time - monotonic()) > 0:
+                    self._stop.wait(delay)
+
+    def _report(self, seconds: float) -> None:
+        with self._lock:
+            latencies, self._interval_latencies = self._interval_latencies, dict()
+
+        for name, histogram in latencies.items():
+            self.latencies.setdefault(name, LatencyHistogram()).merge(histogram)
+
+        self._log(latencies, seconds)
+        if len(self.n_errors) > 0:
+            logger.info(f"Failed reads: {dict(self.n_errors)}")
+
+    @staticmethod
+    def _log(latencies: Dict[str, LatencyHistogram], seconds: float) -> None:
+        lines = [
+            f"{'query':<45} {'n':>8} {'per s':>8} "
+            f"{'p50/ms':>8} {'p95/ms':>8} {'p99/ms':>8} {'max/ms':>8}"
+        ]
+        for name, histogram in sorted(latencies.items()):
+            lines.append(
+                f"{name:<45} {histogram.n:>8} {histogram.n / max(seconds, 1e-9):>8.1f} "
+                + " ".join(
+                    f"{1e3 * histogram.percentile(q):>8.2f}" for q in (50, 95, 99)
+                )
+                + f" {1e3 * histogram.max:>8.2f}"
+            )
+        logger.info("\n".join(lines))
@@ -0,0 +1,132 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import gzip
+import json
+
+from time import monotonic, sleep
+from pathlib import Path
+from typing import Any, Generator, List, NamedTuple, Optional
+
+from satellite._log import logger
+from satellite._schema import DatabaseSchema
+from satellite._utils import to_json_value, from_json_value
+
+_MAGIC = "SATELLITE-OPERATIONS-2\n"
+
+
+class Operation(NamedTuple):
+    """Insert, update or delete of a single row in a table"""
+
+    time: float  # Seconds since the start of the recording
+    operation: str
+    table_name: str
+    id: Optional[int]  # Primary key
+    values: tuple  # For the non-pk columns of an insert or data columns of an update
+    columns: tuple = ()  # Names of the columns set by an update, if not all of them
+
+
+class OperationLog:
+    """
+    Log of operations, written as gzip compressed JSON lines so it can be shared and
+    read safely. Each line is [time, operation, table name, id, values], followed by
+    the column names of an update which sets only some of the data columns
+    """
+
+    def __init__(self, filepath: Path):
+        self._file: Any = gzip.open(filepath, "wt", compresslevel=6, encoding="utf-8")
+        self._file.write(_MAGIC)
+        self._start_time = monotonic()
+
+    def record(
+        self,
+        operation: str,
+        table_name: str,
+        _id: Optional[int],
+        values: tuple = (),
+        columns: tuple = (),
+    ) -> None:
+        elapsed_time = monotonic() - self._start_time
+        record = [
+            elapsed_time,
+            operation,
+            table_name,
+            _id,
+            [to_json_value(value) for value in values],
+        ]
+        if len(columns) > 0:
+            record.append(list(columns))
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_operations(filepath: Path) -> Generator[Operation, None, None]:
+    """Operations in the order they were recorded"""
+
+    with gzip.open(filepath, "rt", encoding="utf-8") as file:
+        if file.readline() != _MAGIC:
+            raise RuntimeError(f"{filepath} is not a Satellite operation log")
+
+        for line in file:
+            elapsed_time, operation, table_name, _id, values, *columns = json.loads(
+                line
+            )
+            yield Operation(
+                elapsed_time,
+                operation,
+                table_name,
+                _id,
+                tuple(from_json_value(value) for value in values),
+                tuple(columns[0]) if columns else (),
+            )
+
+
+def replay(
+    schema: DatabaseSchema, filepath: Path, speed: float, max_batch_size: int
+) -> None:
+    """
+    Replay a log of operations against a schema at a multiple of the recorded speed,
+    or as fast as possible if the speed is not positive. Consecutive operations of
+    the same type on the same columns of a table which are due are executed as a
+    single batch
+    """
+    start_time = monotonic()
+    batch: List[Operation] = []
+    n_operations = 0
+
+    for operation in read_operations(filepath):
+        due_time = start_time + operation.time / speed if speed > 0 else start_time
+
+        if batch and (
+            (operation.operation, operation.table_name, operation.columns)
+            != (batch[0].operation, batch[0].table_name, batch[0].columns)
+            or len(batch) >= max_batch_size
+            or due_time > monotonic()
+        ):
+            schema.execute_batch(batch)
+            n_operations += len(batch)
+            batch = []
+
+        if (delay := due_time - monotonic()) > 0:
+            sleep(delay)
+
+        batch.append(operation)
+
+    if batch:
+        schema.execute_batch(batch)
+        n_operations += len(batch)
+
+    schema.reset_primary_key_sequences()
+    logger.info(f"Replayed {n_operations} operations")
@@ -12,15 +12,58 @@
 #  See the License for the specific language governing permissions and
 # limitations under the License.
 import psycopg2
-from psycopg2 import IntegrityError
-from typing import Optional, Any
+from psycopg2 import IntegrityError, sql
+from psycopg2.pool import ThreadedConnectionPool
+from collections import Counter
+from contextlib import contextmanager
+from time import monotonic, sleep
+from typing import (
+    Optional,
+    Any,
+    Dict,
+    List,
+    Generator,
+    Iterable,
+    Iterator,
+    Tuple,
+    TYPE_CHECKING,
+)
 
 from satellite._log import logger
-from satellite._tables import Row, ExistingRow, Table, Tables
+from satellite._column import Column
+from satellite._fake import fake
+from satellite._profile import phase, timed
+from satellite._settings import EnvVar
+from satellite._tables import Row, ExistingRow, Table, Tables, LiveIds, _TableChunk
+from satellite._server_side import ServerSideGenerator
+
+if TYPE_CHECKING:
+    from satellite._replay import Operation
+
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+OPERATIONS = (INSERT, UPDATE, DELETE)
+
+
+def _session_options() -> Dict[str, str]:
+    """
+    Connection options for each session. By default commits do not wait for the WAL
+    to be flushed, as durability is not required for fake data
+    """
+    settings = {
+        "synchronous_commit": EnvVar("SYNCHRONOUS_COMMIT").or_default(),
+        "statement_timeout": EnvVar("STATEMENT_TIMEOUT").or_default(),  # ms
+    }
+    return {
+        "application_name": EnvVar("APPLICATION_NAME").or_default(),
+        "options": " ".join(f"-c {name}={value}" for name, value in settings.items()),
+    }
 
 
 class DatabaseSchema:
-    """Database containing a fake EMAP star schema"""
+    """
+    Database containing a fake EMAP star schema. A schema which is not connected can
+    still render the SQL to create and populate it
+    """
 
     def __init__(
         self,
@@ -30,6 +73,7 @@ class DatabaseSchema:
         host: Optional[str] = None,
         username: Optional[str] = None,
         password: Optional[str] = None,
+        connect: bool = True,
     ):
         self.tables = tables
         self._name = name
@@ -40,7 +84,13 @@ class DatabaseSchema:
 
         self._cursor: Any = None
         self._connection: Any = None
-        self._try_and_connect()
+        self._in_transaction = False
+        self._has_savepoint = False
+        self.n_failures: Counter = Counter()  # Failed statements keyed on table name
+        # Query, data columns and reused parameters of the update of each table
+        self._update_statements: Dict[tuple, Tuple[str, List[Column], list]] = dict()
+        if connect:
+            self._try_and_connect()
 
     @property
     def database_name(self) -> str:
@@ -50,6 +100,11 @@ class DatabaseSchema:
     def schema_name(self) -> str:
         return self._name
 
+    @property
+    def connect_command(self) -> str:
+        """psql command to connect to the database containing this schema"""
+        return rf"\connect {self.database_name}" + "\n"
+
     @property
     def schema_create_command(self) -> str:
         """Create the database schema"""
@@ -59,16 +114,21 @@ class DatabaseSchema:
                 "a defined username for authorisation"
             )
         return (
-            rf"\connect {self.database_name}" + "\n"
-            f"DROP SCHEMA IF EXISTS {self.schema_name} CASCADE;\n"
+            self.connect_command
+            + f"DROP SCHEMA IF EXISTS {self.schema_name} CASCADE;\n"
             f"CREATE SCHEMA {self.schema_name} "
             f"AUTHORIZATION {self._username};\n"
         )
 
+    @property
+    def is_connected(self) -> bool:
+        """Is there an open connection to the database?"""
+        return self._connection is not None and not bool(self._connection.closed)
+
     @property
     def exists(self) -> bool:
         """Does this schema exist in the database?"""
-        if self._connection is None or bool(self._connection.closed):
+        if not self.is_connected:
             return False
 
         result = self._execute_and_fetch(
@@ -77,33 +137,139 @@ class DatabaseSchema:
         )
         return self.schema_name in result
 
+    def wait_until_exists(
+        self, timeout: Optional[float] = None, max_delay: float = 5.0
+    ) -> bool:
+        """
+        Wait for this schema to exist, checking on a single connection and retrying
+        with exponential backoff. Returns whether it exists before the timeout, if
+        one is defined
+        """
+        end_time = float("inf") if timeout is None else monotonic() + timeout
+        delay = 0.1
+
+        while True:
+            if not self.is_connected:
+                self._try_and_connect()
+            try:
+                if self.exists:
+                    return True
+            except psycopg2.Error:  # e.g. the server restarted after initialisation
+                self.close()
+
+            if monotonic() + delay > end_time:
+                return False
+
+            logger.debug(f"Waiting {delay:.1f} s for {self.schema_name} to exist")
+            sleep(delay)
+            delay = min(2 * delay, max_delay)
+
+    @property
+    def _dsn(self) -> str:
+        return (
+            f"dbname={self._database_name} user={self._username} "
+            f"password={self._password} host={self._host}"
+        )
+
     def _try_and_connect(self) -> None:
         try:
-            self._connection = psycopg2.connect(
-                f"dbname={self._database_name} user={self._username} "
-                f"password={self._password} host={self._host}"
-            )
+            self._connection = psycopg2.connect(self._dsn, **_session_options())
             self._cursor = self._connection.cursor()
         except psycopg2.OperationalError:
             pass
 
-    def empty_table_create_command_for(self, table: Table) -> str:
-        """Create a table for a set of data. Drop it if it exists"""
+    def connection_pool(self, size: int) -> ThreadedConnectionPool:
+        """Pool of up to size connections to the database, shareable by threads"""
+        return ThreadedConnectionPool(1, size, self._dsn, **_session_options())
+
+    def connected_copy(self) -> "DatabaseSchema":
+        """Copy of this schema, sharing the same tables, with a new connection"""
+        return DatabaseSchema(
+            name=self._name,
+            tables=self.tables,
+            database_name=self._database_name,
+            host=self._host,
+            username=self._username,
+            password=self._password,
+        )
 
+    def with_target(self, database_name: str, name: str) -> "DatabaseSchema":
+        """
+        Schema with the same tables in another database and/or schema. The tables
+        are copied so their state e.g. number of rows is independent of this one
+        """
+        return DatabaseSchema(
+            name=name,
+            tables=self.tables.copy(),
+            database_name=database_name,
+            host=self._host,
+            username=self._username,
+            password=self._password,
+        )
+
+    def close(self) -> None:
+        if self.is_connected:
+            self._connection.close()
+
+    def empty_table_create_command_for(
+        self,
+        table: Table,
+        if_not_exists: bool = False,
+        with_foreign_keys: bool = True,
+        bulk: bool = False,
+    ) -> str:
+        """
+        Create a table for a set of data. Drop it if it exists. A table for a bulk
+        load is unlogged and has no constraints, which are added once it is loaded
+        """
+        with_references = with_foreign_keys and not bulk
         columns_name_and_type = ", ".join(
-            [col.definition_in_schema(self._name) for col in table.non_pk_columns]
+            [
+                col.definition_in_schema(self._name, with_references=with_references)
+                for col in table.non_pk_columns
+            ]
         )
         return (
-            f"CREATE TABLE {self.schema_name}.{table.name} "
-            f"({table.primary_key_name} serial PRIMARY KEY, "
+            f"CREATE {'UNLOGGED ' if bulk else ''}TABLE "
+            f"{'IF NOT EXISTS ' if if_not_exists else ''}"
+            f"{self.schema_name}.{table.name} "
+            f"({table.primary_key_name} serial{'' if bulk else ' PRIMARY KEY'}, "
             f"{columns_name_and_type});"
         )
 
-    @staticmethod
-    def _decode_if_bytes(value: Any) -> Any:
-        return value.decode() if isinstance(value, bytes) else value
+    def bulk_load_finish_command_for(self, table: Table) -> str:
+        """
+        Add the primary key to a table created for a bulk load and make it logged, in
+        a single rewrite of the table
+        """
+        return (
+            f"ALTER TABLE {self.schema_name}.{table.name} "
+            f"ADD PRIMARY KEY ({table.primary_key_name}), SET LOGGED;"
+        )
 
-    def add_data_command_for(self, table: Table) -> str:
+    def foreign_key_create_commands_for(self, table: Table) -> List[str]:
+        """Add the foreign key constraints to a table created without them"""
+        return [
+            f"ALTER TABLE {self.schema_name}.{table.name} "
+            f"ADD FOREIGN KEY ({column.name}) "
+            f"REFERENCES {self.schema_name}.{column.table_reference.name};"
+            for column in table.non_pk_columns
+            if column.table_reference is not None
+        ]
+
+    def foreign_key_index_commands_for(
+        self, table: Table, concurrently: bool = False
+    ) -> List[str]:
+        """Create an index on each foreign key column of a table, if it doesn't exist"""
+        return [
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+            f"{table.name}_{column.name}_idx "
+            f"ON {self.schema_name}.{table.name} ({column.name});"
+            for column in table.foreign_key_columns
+        ]
+
+    @timed("serialization")
+    def add_data_command_for(self, table: _TableChunk) -> str:
         """Addd a table to the schema"""
         if table.n_rows == 0:
             logger.debug(f"Not adding any data to {table}. n_rows == 0")
@@ -112,75 +278,389 @@ class DatabaseSchema:
         logger.info(f"Adding table data: {table.name}")
 
         column_names = ",".join(col.name for col in table.non_pk_columns)
-        string = (
+        literals = [
+            column.sql_literals(table[column]) for column in table.non_pk_columns
+        ]
+
+        return (
             f"  INSERT INTO {self.schema_name}.{table.name} ({column_names}) VALUES \n"
+            + ",\n".join("  (" + ",".join(row) + ")" for row in zip(*literals))
+            + ";"
         )
 
-        for i in range(table.n_rows):
-            values = ",".join(
-                column.format_specifier % self._decode_if_bytes(table[column][i])
-                if table[column][i] is not None
-                else "null"
-                for column in table.non_pk_columns
+    def add_data_commands_for(self, table: Table, chunk_size: int) -> Generator:
+        """Commands to add table.n_rows of fake data to a table, a chunk at a time"""
+
+        for first_row in range(0, table.n_rows, chunk_size):
+            n_rows = min(chunk_size, table.n_rows - first_row)
+            yield self.add_data_command_for(
+                table.fake_chunk(first_row=first_row, n_rows=n_rows)
             )
-            string += f"  ({values}),\n"
 
-        return string.rstrip(",\n") + ";"
+    def _execute(
+        self,
+        query: str,
+        values: Optional[list] = None,
+        table_name: Optional[str] = None,
+    ) -> bool:
+        """
+        Execute a query, returning whether it succeeded. Within a transaction the
+        query runs in a savepoint, so a failure discards only its own changes. The
+        savepoint is released and re-created in the same round-trip as the query
+        """
+        if self._in_transaction:
+            release = "RELEASE SAVEPOINT satellite; " if self._has_savepoint else ""
+            query = f"{release}SAVEPOINT satellite; {query}"
+            self._has_savepoint = True
 
-    def _execute(self, query: str, values: Optional[list] = None) -> None:
         try:
-            self._cursor.execute(query=query, vars=values)
+            with phase("db round-trip"):
+                self._cursor.execute(query=query, vars=values)
+            return True
         except IntegrityError as e:
             logger.warning(f"Failed to execute due to:\n{e}")
-            self._connection.rollback()
+            if table_name is not None:
+                self.n_failures[table_name] += 1
+
+            if self._in_transaction:
+                self._cursor.execute("ROLLBACK TO SAVEPOINT satellite")
+            else:
+                self._connection.rollback()
+            return False
 
     def _execute_and_fetch(self, query: str, values: Optional[list] = None) -> tuple:
         self._execute(query, values)
-        return tuple(self._cursor.fetchone())
+        row = self._cursor.fetchone()
+        return () if row is None else tuple(row)
 
-    def _execute_and_commit(self, query: str, values: Optional[list] = None) -> None:
-        self._execute(query=query, values=values)
-        self._connection.commit()
+    def _execute_and_commit(
+        self,
+        query: str,
+        values: Optional[list] = None,
+        table_name: Optional[str] = None,
+    ) -> bool:
+        """Execute a query and commit, unless the commit is deferred by a transaction"""
+        succeeded = self._execute(query=query, values=values, table_name=table_name)
+        if not self._in_transaction:
+            with phase("db round-trip"):
+                self._connection.commit()
+        return succeeded
 
-    def insert(self, row: Row) -> None:
-        """Insert a single row from a table"""
+    @property
+    def in_transaction(self) -> bool:
+        return self._in_transaction
+
+    def begin(self) -> None:
+        """
+        Execute the following queries in a single transaction, until commit() is
+        called. Queries that violate a constraint are skipped without aborting it
+        """
+        assert self.is_connected and not self._in_transaction
+        self._in_transaction = True
+
+    def commit(self) -> None:
+        with phase("db round-trip"):
+            self._connection.commit()
+        self._in_transaction = self._has_savepoint = False
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Execute queries in a single transaction, committed on exit"""
+        self.begin()
+        try:
+            yield
+        except Exception:
+            self._connection.rollback()
+            self._in_transaction = self._has_savepoint = False
+            raise
+        self.commit()
+
+    def insert(self, row: Row) -> Optional[int]:
+        """Insert a single row from a table. Returns the primary key of the new row"""
         assert self.exists
         column_names = ", ".join(column.name for column in row.non_pk_columns)
         value_definitions = ",".join("%s" for _ in range(len(row.non_pk_columns)))
 
-        self._execute_and_commit(
+        if self._execute_and_commit(
             f"INSERT INTO {self.schema_name}.{row.table_name} "
-            f"({column_names}) VALUES ({value_definitions})",
+            f"({column_names}) VALUES ({value_definitions}) "
+            f"RETURNING {row.pk_column.name}",
             values=[row[column] for column in row.non_pk_columns],
-        )
+            table_name=row.table_name,
+        ):
+            return self._cursor.fetchone()[0]
+
+        return None
 
-    def update(self, row: ExistingRow) -> None:
-        """Update the values in a row that exists in a table already"""
+    def update(self, row: ExistingRow) -> bool:
+        """
+        Update the values in a row that exists in a table already. Returns whether
+        it was updated
+        """
         assert self.exists and row.id is not None
-        if len(row.data_columns) == 0:
-            return  # Nothing to be updated
 
-        col_names_and_format = ",".join(f"{c.name} = %s" for c in row.data_columns)
+        key = (row.table_name, fake.updated_column_names(row.table_name))
+        if (statement := self._update_statements.get(key)) is None:
+            columns = row.updated_columns
+            statement = self._update_statements[key] = (
+                self._update_query_for(row, columns),
+                columns,
+                [None] * (len(columns) + 1),
+            )
+        query, columns, values = statement
+        if len(columns) == 0:
+            return False  # Nothing to be updated
 
-        self._execute_and_commit(
+        for i, column in enumerate(columns):
+            values[i] = row[column]
+        values[-1] = row.id
+
+        return (
+            self._execute_and_commit(query, values=values, table_name=row.table_name)
+            and self._cursor.rowcount > 0
+        )
+
+    def _update_query_for(self, row: ExistingRow, columns: List[Column]) -> str:
+        col_names_and_format = ",".join(f"{c.name} = %s" for c in columns)
+        return (
             f"UPDATE {self.schema_name}.{row.table_name} SET {col_names_and_format} "
-            f"WHERE {row.pk_column.name} = {row.id};",
-            values=[row[column] for column in row.data_columns],
+            f"WHERE {row.pk_column.name} = %s;"
         )
 
-    def delete(self, row: ExistingRow) -> None:
-        """Delete a row that exists in the schema"""
+    def delete(self, row: ExistingRow) -> bool:
+        """Delete a row that exists in the schema. Returns whether it was deleted"""
         assert self.exists
 
         if row.id is None:
             logger.warning("Primary key for delete was unspecified - skipping")
-            return
+            return False
+
+        return (
+            self._execute_and_commit(
+                f"DELETE FROM {self.schema_name}.{row.table_name} "
+                f"WHERE {row.pk_column.name} = {row.id};",
+                table_name=row.table_name,
+            )
+            and self._cursor.rowcount > 0
+        )
+
+    def create_if_not_exists(self) -> None:
+        """Create this schema and all its tables, if they are not already present"""
+        assert self.is_connected
+
+        self._execute_and_commit(
+            f"CREATE SCHEMA IF NOT EXISTS {self.schema_name} "
+            f"AUTHORIZATION {self._username};"
+        )
+        for table in self.tables.topologically_sorted():
+            self._execute_and_commit(
+                self.empty_table_create_command_for(table, if_not_exists=True)
+            )
+
+    def recreate(self, with_foreign_keys: bool = True, bulk: bool = False) -> None:
+        """Drop this schema, if it exists, and create it with empty tables"""
+        assert self.is_connected
 
         self._execute_and_commit(
-            f"DELETE FROM {self.schema_name}.{row.table_name} "
-            f"WHERE {row.pk_column.name} = {row.id};"
+            f"DROP SCHEMA IF EXISTS {self.schema_name} CASCADE; "
+            f"CREATE SCHEMA {self.schema_name} AUTHORIZATION {self._username};"
+        )
+        for table in self.tables.topologically_sorted():
+            self._execute_and_commit(
+                self.empty_table_create_command_for(
+                    table, with_foreign_keys=with_foreign_keys, bulk=bulk
+                )
+            )
+
+    def add_foreign_keys(self) -> None:
+        """Add all foreign key constraints to tables created without them"""
+        for table in self.tables:
+            for command in self.foreign_key_create_commands_for(table):
+                self._execute_and_commit(command)
+
+    def add_foreign_key_indexes(self) -> None:
+        """
+        Build an index on every foreign key column. The indexes are built
+        concurrently, so tables can be written to while they are built
+        """
+        logger.info("Adding indexes on the foreign key columns")
+        self._connection.commit()
+        # Concurrent builds can't be in a transaction
+        self._connection.autocommit = True
+        try:
+            # A failed concurrent build leaves an invalid index, which IF NOT EXISTS
+            # would otherwise keep
+            index_names = {
+                f"{table.name}_{column.name}_idx"
+                for table in self.tables
+                for column in table.foreign_key_columns
+            }
+            for name in index_names.intersection(self._invalid_index_names()):
+                logger.info(f"Dropping invalid index {name}")
+                self._execute(
+                    f"DROP INDEX CONCURRENTLY IF EXISTS {self.schema_name}.{name};"
+                )
+
+            for table in self.tables:
+                for command in self.foreign_key_index_commands_for(
+                    table, concurrently=True
+                ):
+                    self._execute(command)
+        finally:
+            self._connection.autocommit = False
+
+    def _invalid_index_names(self) -> List[str]:
+        self._execute(
+            "SELECT class.relname FROM pg_index AS index "
+            "JOIN pg_class AS class ON class.oid = index.indexrelid "
+            "JOIN pg_namespace AS namespace ON namespace.oid = class.relnamespace "
+            "WHERE namespace.nspname = %s AND NOT index.indisvalid",
+            [self.schema_name],
+        )
+        return [name for (name,) in self._cursor.fetchall()]
+
+    def create_publication(self, name: str) -> None:
+        """
+        Create a publication of all tables in this schema, for logical replication.
+        If it exists any tables not yet published e.g. as they were recreated, or
+        are in another schema, are added to it
+        """
+        n_publications = self._execute_and_fetch(
+            "SELECT COUNT(*) FROM pg_publication WHERE pubname = %s", [name]
+        )[0]
+        self._execute(
+            "SELECT tablename FROM pg_publication_tables "
+            "WHERE pubname = %s AND schemaname = %s",
+            [name, self.schema_name],
+        )
+        published = {table_name for (table_name,) in self._cursor.fetchall()}
+        tables = [
+            sql.Identifier(self.schema_name, table.name)
+            for table in self.tables
+            if table.name not in published
+        ]
+        publication = sql.Identifier(name)
+        table_names = sql.SQL(", ").join(tables)
+
+        if n_publications == 0 and len(tables) == 0:
+            query = sql.SQL("CREATE PUBLICATION {};").format(publication)
+        elif n_publications == 0:
+            query = sql.SQL("CREATE PUBLICATION {} FOR TABLE {};").format(
+                publication, table_names
+            )
+        elif len(tables) > 0:
+            query = sql.SQL("ALTER PUBLICATION {} ADD TABLE {};").format(
+                publication, table_names
+            )
+        else:  # All tables are already published
+            self._connection.commit()
+            return
+
+        self._execute_and_commit(query.as_string(self._connection))
+
+    def analyze(self) -> None:
+        """Update the planner statistics of all tables e.g. after a bulk load"""
+        for table in self.tables:
+            self._execute_and_commit(f"ANALYZE {self.schema_name}.{table.name};")
+
+    def load(
+        self,
+        table: Table,
+        chunk_size: int,
+        server_side: Optional[ServerSideGenerator] = None,
+    ) -> None:
+        """
+        Insert table.n_rows of fake data into a table in chunks. Generated within
+        the database if a server side generator is given
+        """
+        if server_side is None:
+            commands = self.add_data_commands_for(table, chunk_size=chunk_size)
+        else:
+            commands = server_side.insert_commands_for(table, chunk_size=chunk_size)
+
+        for command in commands:
+            self._execute_and_commit(command)
+
+    def execute_commands(self, commands: Iterable[str]) -> None:
+        """Execute and commit each of a set of commands"""
+        for command in commands:
+            self._execute_and_commit(command)
+
+    def insert_chunk(self, chunk: _TableChunk) -> bool:
+        """
+        Insert all the rows in a chunk of a table within a single transaction. Returns
+        whether they were inserted
+        """
+        assert self.exists
+        return self._execute_and_commit(
+            self.add_data_command_for(chunk), table_name=chunk.name
         )
 
+    def execute_batch(self, operations: List["Operation"]) -> None:
+        """
+        Execute operations of the same type on the same table in a single transaction.
+        Inserted rows keep the primary keys with which they were recorded. If the
+        batch fails each operation is retried alone, so only invalid ones are skipped
+        """
+        assert self.is_connected and len(operations) > 0
+
+        with self.transaction():
+            if not self._execute_operations(operations):
+                for operation in operations:
+                    self._execute_operations([operation], count_failures=True)
+
+    def _execute_operations(
+        self, operations: List["Operation"], count_failures: bool = False
+    ) -> bool:
+        """Execute operations of the same type on the same table in one query"""
+        operation = operations[0].operation
+        table = self.tables.named(operations[0].table_name)
+        table_name = f"{self.schema_name}.{table.name}"
+        pk_name = table.primary_key_name
+
+        def mogrified(template: str, rows: list, separator: str) -> str:
+            with phase("serialization"):
+                return separator.join(
+                    self._cursor.mogrify(template, row).decode() for row in rows
+                )
+
+        if operation == INSERT:
+            columns = [pk_name] + [c.name for c in table.non_pk_columns]
+            rows = [(op.id,) + op.values for op in operations]
+            template = "(" + ", ".join("%s" for _ in columns) + ")"
+            query = (
+                f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                f"VALUES {mogrified(template, rows, separator=', ')}"
+            )
+        elif operation == UPDATE:
+            names = operations[0].columns or [c.name for c in table.data_columns]
+            col_names_and_format = ",".join(f"{name} = %s" for name in names)
+            template = f"UPDATE {table_name} SET {col_names_and_format} "
+            template += f"WHERE {pk_name} = %s"
+            rows = [op.values + (op.id,) for op in operations]
+            query = mogrified(template, rows, separator="; ")
+        elif operation == DELETE:
+            query = self._cursor.mogrify(
+                f"DELETE FROM {table_name} WHERE {pk_name} = ANY(%s)",
+                ([op.id for op in operations],),
+            ).decode()
+        else:
+            raise ValueError(f"Unknown operation: {operation}")
+
+        return self._execute(query, table_name=table.name if count_failures else None)
+
+    def reset_primary_key_sequences(self) -> None:
+        """Set the sequence of each serial primary key to follow the largest key"""
+
+        for table in self.tables:
+            table_name = f"{self.schema_name}.{table.name}"
+            pk_name = table.primary_key_name
+            self._execute_and_commit(
+                f"SELECT setval(pg_get_serial_sequence('{table_name}', '{pk_name}'), "
+                f"COALESCE(MAX({pk_name}), 0) + 1, false) FROM {table_name};"
+            )
+
+    @timed("row-count refresh")
     def update_num_rows_in_tables(self) -> None:
         """Set the number of rows in each table"""
         assert self.exists
@@ -191,3 +671,52 @@ class DatabaseSchema:
                 f"SELECT COUNT(*) FROM {self.schema_name}.{table.name}"
             )[0]
             logger.info(f"{table.name} has {table.n_rows} rows")
+
+    @timed("row-count refresh")
+    def update_live_ids_in_tables(self, partition: Tuple[int, int] = (0, 1)) -> None:
+        """
+        Set the primary keys of the rows present in each table referenced by a foreign
+        key, from which foreign keys are sampled. With a partition (i, n) only keys
+        where key % n == i are included. At most MAX_LIVE_IDS keys of each table are
+        kept, sampled from random blocks of larger tables, so memory is bounded
+        """
+        assert self.exists
+        logger.info("Setting the primary keys present in each referenced table")
+        index, n_partitions = partition
+        max_n_ids = int(EnvVar("MAX_LIVE_IDS").or_default())
+        referenced = {
+            column.table_reference.name  # type: ignore
+            for table in self.tables
+            for column in table.foreign_key_columns
+        }
+
+        for table in self.tables:
+            if table.name not in referenced:
+                continue
+
+            pk_name = table.primary_key_name
+            where = (
+                ""
+                if n_partitions == 1
+                else f"WHERE {pk_name} % {n_partitions} = {index}"
+            )
+            sample = ""
+            # Sample twice as many rows as needed, as the rows per block vary
+            if (fraction := 2 * max_n_ids * n_partitions / max(table.n_rows, 1)) < 1:
+                sample = f"TABLESAMPLE SYSTEM ({100 * fraction})"
+
+            table.live_ids = self._live_ids(table, f"{sample} {where}", max_n_ids)
+            if sample != "" and len(table.live_ids) < max_n_ids // 2:  # Unlucky
+                table.live_ids = self._live_ids(table, where, max_n_ids)
+
+    def _live_ids(self, table: Table, condition: str, max_n_ids: int) -> LiveIds:
+        """Keys streamed from a server-side cursor, rather than all fetched at once"""
+        with self._connection.cursor(name="live_ids") as cursor:
+            cursor.itersize = 10_000
+            cursor.execute(
+                f"SELECT {table.primary_key_name} FROM {self.schema_name}.{table.name} "
+                f"{condition} LIMIT {max_n_ids}"
+            )
+            live_ids = LiveIds(_id for (_id,) in cursor)
+        self._connection.commit()
+        return live_ids
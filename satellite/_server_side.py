@@ -0,0 +1,263 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import string
+
+from datetime import datetime, date
+from typing import Any, Dict, Generator, Iterable, List, Optional
+
+from satellite._column import Column, _text_literal
+from satellite._fake import fake_stream, derived_seed, _ETHNICITIES
+from satellite._tables import Table
+
+
+def _random_int(low: int, high: int) -> str:
+    """Random integer in [low, high], as with faker.random_int"""
+    return f"({low} + floor(random() * {high - low + 1}))::bigint"
+
+
+def _random_digits(n: int) -> str:
+    return f"lpad(floor(random() * 1e{n})::bigint::text, {n}, '0')"
+
+
+def _random_letters(n: int) -> str:
+    letter = f"substr('{string.ascii_letters}', {_random_int(1, 52)}::int, 1)"
+    return " || ".join(n * [letter])
+
+
+def _random_element(values: List[str]) -> str:
+    array = ", ".join(_text_literal(value) for value in values)
+    return f"(ARRAY[{array}])[{_random_int(1, len(values))}::int]"
+
+
+def _or_null(expression: str, p: float) -> str:
+    """Expression or null dependent on the probability"""
+    return f"CASE WHEN random() > {p} THEN {expression} END"
+
+
+def _random_datetime(start: datetime, end: datetime, rand: str = "random()") -> str:
+    seconds = (end - start).total_seconds()
+    return f"timestamp '{start.isoformat()}' + {rand} * interval '{seconds} seconds'"
+
+
+_recent_datetime = _random_datetime(datetime(2018, 1, 1), datetime(2023, 1, 1))
+_text = _random_letters(5)
+_date = f"date '1970-01-01' + {_random_int(0, 18992)}::int"
+
+# SQL expressions that generate values equivalent to those of the faker provider
+# methods with the same name. Any other providers are sampled from a lookup table
+_provider_expressions: Dict[str, str] = {
+    "default": "''",
+    "mrn": _random_digits(9),
+    "bigint": _random_int(0, 9999),
+    "text": _text,
+    "boolean": "random() < 0.5",
+    "real": f"({_random_int(0, 1000)} / 100.0)::real",
+    "bytea": f"convert_to({_text}, 'UTF8')",
+    "source_system": _random_element(["source_a", "source_b"]),
+    "nhs_number": _or_null(_random_digits(10), p=0.1),
+    "ethnicity": _random_element(_ETHNICITIES),
+    "sex": _random_element(["UNKNOWN", "M", "F"]),
+    "location_string": f"'T' || {_random_digits(2)} || '-B' || {_random_digits(2)}",
+    "arrival_method": _or_null(_random_element(["Ambulance", "Walk in"]), p=0.5),
+    "encounter": _random_digits(9),
+    "comments": "null",
+    "comment": "null",
+    "consultation_type_code": f"'CON' || {_random_digits(3)}",
+    "consultation_type_name": "null",
+    "clinical_information": "null",
+    "battery_code": _random_letters(2),
+    "battery_name": "null",
+    "standardised_code": "null",
+    "standardised_vocabulary": "null",
+    "name": _text,
+    "patient_class": "null",
+    "timestamptz": (
+        "timestamp '1970-01-01' + random() * (localtimestamp - timestamp '1970-01-01')"
+    ),
+    "valid_from": _recent_datetime,
+    "stored_from": _recent_datetime,
+    "date": _date,
+    "discharge_datetime": _or_null(_recent_datetime, p=0.1),
+}
+
+
+def _hospital_visit_datetime(rand: str) -> str:
+    start = datetime(2018, 1, 1)
+    end = start + (datetime(2023, 1, 1) - start) / 3
+    return _random_datetime(start, end, rand=rand)
+
+
+# Expressions for the columns of tables that are generated together by a table-level
+# faker method. They share the random variables r1...r4, drawn once per row
+_n_row_variables = 4
+_table_expressions: Dict[str, Dict[str, str]] = {
+    "hospital_visit": {
+        "presentation_datetime": _hospital_visit_datetime("r1"),
+        "admission_datetime": _hospital_visit_datetime("(r1 + r2)"),
+        "discharge_datetime": (
+            f"CASE WHEN r4 > 0.2 THEN {_hospital_visit_datetime('(r1 + r2 + r3)')} END"
+        ),
+    },
+    "visit_observation": {
+        "value_as_text": f"CASE WHEN r1 < 0.2 THEN {_text} END",
+        "value_as_real": (
+            f"CASE WHEN r1 >= 0.2 AND r1 < 0.8 THEN {_provider_expressions['real']} END"
+        ),
+        "value_as_date": f"CASE WHEN r1 >= 0.8 THEN {_date} END",
+    },
+}
+
+
+def _lookup_literal(value: Any) -> str:
+    """Value of a provider as a text literal, which may be cast to a column type"""
+
+    if value is None:
+        return "null"
+    elif isinstance(value, bool):
+        return _text_literal("true" if value else "false")
+    elif isinstance(value, (datetime, date)):
+        return _text_literal(value.isoformat())
+    elif isinstance(value, bytes):
+        return _text_literal(value.hex())
+    else:
+        return _text_literal(value)
+
+
+class ServerSideGenerator:
+    """
+    Compiles tables into commands that generate fake data within postgres, as
+    INSERT ... SELECT from generate_series, so no rows are generated in python or
+    sent over a connection. Providers without an SQL equivalent are sampled from a
+    lookup table of values generated in python, which must be created beforehand
+    """
+
+    def __init__(self, schema_name: str, lookup_size: int = 1000):
+        self.schema_name = schema_name
+        self.lookup_size = lookup_size
+
+    @property
+    def lookup_table_name(self) -> str:
+        return f"{self.schema_name}.satellite_lookup"
+
+    def _table_expressions_for(self, table: Table) -> Dict[str, str]:
+        return _table_expressions.get(table.name, dict())
+
+    def _lookup_provider_names_for(self, table: Table) -> List[str]:
+        table_expressions = self._table_expressions_for(table)
+        return [
+            name
+            for column in table.non_pk_columns
+            if column.name not in table_expressions
+            and (name := column.provider_name) is not None
+            and name not in _provider_expressions
+        ]
+
+    def lookup_create_commands(self, tables: Iterable[Table]) -> List[str]:
+        """Commands to create a lookup table with values of python-only providers"""
+
+        names = sorted(
+            {
+                name
+                for table in tables
+                for name in self._lookup_provider_names_for(table)
+            }
+        )
+        commands = [
+            f"CREATE TABLE {self.lookup_table_name} "
+            f"(provider text, idx integer, value text, PRIMARY KEY (provider, idx));"
+        ]
+
+        for name in names:
+            method = getattr(fake_stream("lookup", name), name)
+            rows = ", ".join(
+                f"({_text_literal(name)}, {idx}, {_lookup_literal(method())})"
+                for idx in range(self.lookup_size)
+            )
+            commands.append(
+                f"INSERT INTO {self.lookup_table_name} (provider, idx, value) "
+                f"VALUES {rows};"
+            )
+
+        return commands
+
+    @property
+    def lookup_drop_command(self) -> str:
+        return f"DROP TABLE IF EXISTS {self.lookup_table_name};"
+
+    def _expression_for(self, column: Column, table: Table) -> str:
+
+        if column.name in (table_expressions := self._table_expressions_for(table)):
+            return table_expressions[column.name]
+
+        elif (name := column.provider_name) is None:  # Foreign key
+            n_rows = max(column.table_reference.n_rows, 1)  # type: ignore
+            return _random_int(1, n_rows)
+
+        elif name in _provider_expressions:
+            expression = _provider_expressions[name]
+
+        else:
+            expression = (
+                f"SELECT value FROM {self.lookup_table_name} "
+                f"WHERE provider = '{name}' AND idx = row_variables.i_{name}"
+            )
+            if column.sql_type == "bytea":  # Stored as hex, as text casts verbatim
+                expression = f"decode(({expression}), 'hex')"
+
+        return f"({expression})::{column.sql_type}"
+
+    def _row_variables_for(self, table: Table) -> List[str]:
+        """Random values drawn once per row, which may be shared between columns"""
+
+        variables = [
+            f"floor(random() * {self.lookup_size})::int AS i_{name}"
+            for name in sorted(set(self._lookup_provider_names_for(table)))
+        ]
+        if table.name in _table_expressions:
+            variables += [f"random() AS r{i}" for i in range(1, _n_row_variables + 1)]
+
+        return variables
+
+    def insert_command_for(
+        self, table: Table, n_rows: int, first_row: Optional[int] = None
+    ) -> str:
+        """
+        Command to insert n_rows of fake data into a table. With a first row the
+        random number generator of the session is seeded from it, so the same rows
+        are generated for the same table, first row and FAKER_SEED
+        """
+        columns = table.non_pk_columns
+        column_names = ", ".join(column.name for column in columns)
+        expressions = ", ".join(self._expression_for(col, table) for col in columns)
+        variables = ", ".join(["g"] + self._row_variables_for(table))
+
+        seed_command = ""
+        if first_row is not None:
+            seed = derived_seed(table.name, "server", first_row) / 2**63 - 1.0
+            seed_command = f"SELECT setseed({seed!r});\n"
+
+        return (
+            f"{seed_command}"
+            f"INSERT INTO {self.schema_name}.{table.name} ({column_names})\n"
+            f"SELECT {expressions}\n"
+            f"FROM (SELECT {variables} FROM generate_series(1, {n_rows}) AS g "
+            f"OFFSET 0) AS row_variables;"
+        )
+
+    def insert_commands_for(self, table: Table, chunk_size: int) -> Generator:
+        """Commands that insert table.n_rows of fake data, in chunks"""
+
+        for first_row in range(0, table.n_rows, chunk_size):
+            n_rows = min(chunk_size, table.n_rows - first_row)
+            yield self.insert_command_for(table, n_rows, first_row=first_row)
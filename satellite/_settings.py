@@ -23,6 +23,11 @@ _default_values = {
     "POSTGRES_HOST": "localhost",
     "N_TABLE_ROWS": "0",
     "DATABASE_NAME": "emap",
+    "FAKER_POOL_SIZE": "0",
+    "SYNCHRONOUS_COMMIT": "off",
+    "APPLICATION_NAME": "satellite",
+    "STATEMENT_TIMEOUT": "0",
+    "MAX_LIVE_IDS": "100000",
 }
 
 
@@ -11,17 +11,61 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  See the License for the specific language governing permissions and
 # limitations under the License.
+import copy
 import git
 import networkx as nx
 
-from typing import List, Generator, Optional, Any, Dict
+from typing import List, Generator, Optional, Any, Dict, Callable, Iterable
 from pathlib import Path
 
 from satellite._utils import camel_to_snake_case
 from satellite._settings import EnvVar
 from satellite._log import logger
+from satellite._profile import phase, timed
 from satellite._column import Column
-from satellite._fake import fake
+from satellite._fake import fake, fake_stream, _Faker
+
+# Number of rows generated from a single seed stream of a column. Any range of rows
+# can be reproduced by re-seeding the streams of the chunks that it overlaps
+N_ROWS_PER_STREAM = 1000
+
+
+class LiveIds:
+    """
+    Primary keys of the rows present in a table. Keys can be added, removed and
+    sampled at random in constant time
+    """
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._ids: List[int] = []
+        self._index: Dict[int, int] = dict()  # Position of each key in the list
+
+        for _id in ids:
+            self.add(_id)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, _id: Any) -> bool:
+        return _id in self._index
+
+    def add(self, _id: int) -> None:
+        if _id not in self._index:
+            self._index[_id] = len(self._ids)
+            self._ids.append(_id)
+
+    def remove(self, _id: int) -> None:
+        """Remove a key, if present, by moving the last key into its position"""
+        if (idx := self._index.pop(_id, None)) is None:
+            return
+
+        last_id = self._ids.pop()
+        if idx < len(self._ids):
+            self._ids[idx] = last_id
+            self._index[last_id] = idx
+
+    def sample(self, _fake: _Faker) -> int:
+        return self._ids[_fake.random.randrange(len(self._ids))]
 
 
 class _TableChunk:
@@ -55,43 +99,124 @@ class _TableChunk:
             if not column.is_primary_key and not column.is_foreign_key
         ]
 
+    @property
+    def foreign_key_columns(self) -> List[Column]:
+        """Columns that reference the primary key of another table"""
+        return [column for column in self.columns if column.is_foreign_key]
+
     @property
     def pk_column(self) -> Column:
         """Primary key column"""
         return next(column for column in self.columns if column.is_primary_key)
 
+    @property
+    def _override_faker_method_name(self) -> str:
+        return self.name
+
     @property
     def has_override_faker_method(self) -> bool:
         """Does faker have a method suitable to generate a whole row of this table?"""
-        return hasattr(fake, self.name)
+        return hasattr(fake, self._override_faker_method_name)
+
+    def _fake_values(
+        self,
+        stream_key: str,
+        method_for: Callable[[_Faker], Callable],
+        first_row: Optional[int],
+    ) -> list:
+        """
+        Generate n_rows values using a method of a faker. If the first row is
+        undefined the shared faker is used, otherwise each chunk of rows is generated
+        from its own stream keyed on this table, the stream key and the chunk index
+        """
+        if first_row is None:
+            method = method_for(fake)
+            return [method() for _ in range(self.n_rows)]
+
+        values: List[Any] = []
+        row_idx, end_row_idx = first_row, first_row + self.n_rows
+
+        while row_idx < end_row_idx:
+            chunk_idx, offset = divmod(row_idx, N_ROWS_PER_STREAM)
+            n_values = min(N_ROWS_PER_STREAM - offset, end_row_idx - row_idx)
+            method = method_for(fake_stream(self.name, stream_key, chunk_idx))
+
+            for _ in range(offset):  # Resuming part way through a chunk
+                method()
 
-    def _override_columns(self) -> None:
-        """Add data to this table with a table-specific method by generating rows"""
+            values += [method() for _ in range(n_values)]
+            row_idx += n_values
 
-        faker_method = getattr(fake, self.name)
-        rows = [faker_method() for _ in range(self.n_rows)]
+        return values
+
+    def _fake_batch(self, method_name: str, first_row: Optional[int]) -> dict:
+        """
+        Generate n_rows of columnar data with a batch method of a faker, which
+        returns a dictionary of column names and lists of values
+        """
+        if first_row is None:
+            return getattr(fake, method_name)(self.n_rows)
+
+        data: Dict[str, list] = dict()
+        row_idx, end_row_idx = first_row, first_row + self.n_rows
+
+        while row_idx < end_row_idx:
+            chunk_idx, offset = divmod(row_idx, N_ROWS_PER_STREAM)
+            n_values = min(N_ROWS_PER_STREAM - offset, end_row_idx - row_idx)
+            method = getattr(fake_stream(self.name, "", chunk_idx), method_name)
+
+            for name, values in method(offset + n_values).items():
+                data.setdefault(name, []).extend(values[offset:])
+
+            row_idx += n_values
+
+        return data
+
+    def _override_columns(self, first_row: Optional[int] = None) -> None:
+        """
+        Add data to this table with a table-specific method. A batch method which
+        generates columns, if defined, is preferred over generating rows
+        """
+        method_name = self._override_faker_method_name
+
+        if hasattr(fake, f"{method_name}_batch"):
+            data = self._fake_batch(f"{method_name}_batch", first_row)
+        else:
+            rows = self._fake_values(
+                stream_key="",  # Column names are never empty
+                method_for=lambda _fake: getattr(_fake, method_name),
+                first_row=first_row,
+            )
+            data = dict()
+            if isinstance(rows[0], dict):  # Column methods e.g. mrn may share a name
+                data = {name: [row[name] for row in rows] for name in rows[0]}
 
         for column in self.columns:
-            if column.name in rows[0]:
-                self[column] = [row[column.name] for row in rows]
+            if column.name in data:
+                self[column] = data[column.name]
 
-    def add_fake_data(self, skip_foreign_keys: bool = False) -> None:
+    @timed("generation")
+    def add_fake_data(
+        self, skip_foreign_keys: bool = False, first_row: Optional[int] = None
+    ) -> None:
+        """
+        Add n_rows of fake data to each column. If first_row is defined the values
+        are those of rows [first_row, first_row + n_rows) in a deterministic sequence,
+        independent of any other generation performed by this process or thread
+        """
         logger.debug(f"Adding fake data to {self.name}")
 
         for column in self.data_columns if skip_foreign_keys else self.non_pk_columns:
             logger.debug(f"Creating {self.n_rows} row(s) of data to {column.name}")
 
-            function = column.faker_method
-
-            if self.n_rows == 1:
-                self[column] = function()
-            else:
-                values = self[column]
-                for _ in range(self.n_rows):
-                    values.append(function())
+            self[column] = self._fake_values(
+                stream_key=column.name,
+                method_for=column.faker_method_for,
+                first_row=first_row,
+            )
 
         if self.has_override_faker_method and self.n_rows > 0:
-            self._override_columns()
+            self._override_columns(first_row)
 
         return None
 
@@ -141,6 +266,38 @@ class ExistingRow(Row):
     ):
         super().__init__(table_name=table_name, columns=columns)
         self.id = primary_key_id
+        self._data_columns: Optional[List[Column]] = None  # Set once generated
+        self._has_override = False
+
+    @property
+    def updated_columns(self) -> List[Column]:
+        """Data columns set when this row is updated"""
+        names = fake.updated_column_names(self.name)
+        return [c for c in self.data_columns if names is None or c.name in names]
+
+    @property
+    def _override_faker_method_name(self) -> str:
+        """Rows of a table may be updated with a specific method, if one is defined"""
+        update_method_name = f"{self.name}_update"
+        return update_method_name if hasattr(fake, update_method_name) else self.name
+
+    @timed("generation")
+    def randomise_data(self) -> None:
+        """
+        Generate new values for the data columns. Once generated, values are replaced
+        in place, drawing the same values as add_fake_data(skip_foreign_keys=True)
+        """
+        if self._data_columns is None:
+            self._data_columns = self.data_columns
+            self._has_override = self.has_override_faker_method
+            self.add_fake_data(skip_foreign_keys=True)
+            return
+
+        for column in self._data_columns:
+            self._data[column][0] = column.faker_method_for(fake)()
+
+        if self._has_override:
+            self._override_columns()
 
 
 class Table(_TableChunk):
@@ -150,6 +307,8 @@ class Table(_TableChunk):
         super().__init__(name=name)
         self._extended_tables: List[str] = []
         self.n_rows = int(EnvVar("N_TABLE_ROWS").or_default())
+        self.live_ids: Optional[LiveIds] = None  # Defined if tracked e.g. by a workload
+        self._existing_row: Optional[ExistingRow] = None  # Reused by updates
 
     @classmethod
     def from_java_file(cls, filepath: Path) -> "Table":
@@ -215,16 +374,42 @@ class Table(_TableChunk):
     def fake_row(self) -> NewRow:
         return NewRow.with_fake_values(table_name=self.name, columns=self.columns)
 
+    def fake_chunk(self, first_row: int, n_rows: int) -> _TableChunk:
+        """Rows [first_row, first_row + n_rows) of deterministic fake data"""
+        chunk = _TableChunk(name=self.name)
+        chunk.n_rows = n_rows
+        chunk._data = {column: [] for column in self.columns}
+        chunk.add_fake_data(first_row=first_row)
+        return chunk
+
+    def random_id(self, _fake: _Faker = fake) -> Optional[int]:
+        """
+        Primary key of a random row. Sampled from the live keys if they are tracked,
+        otherwise assumes the keys are 1...n_rows, as after a load
+        """
+        if self.live_ids is not None:
+            return None if len(self.live_ids) == 0 else self.live_ids.sample(_fake)
+
+        return None if self.n_rows == 0 else _fake.pyint(1, self.n_rows)
+
     def random_existing_row(self) -> ExistingRow:
         return ExistingRow(
             table_name=self.name,
             columns=self.columns,
-            primary_key_id=None if self.n_rows == 0 else fake.pyint(1, self.n_rows),
+            primary_key_id=self.random_id(),
         )
 
     def randomised_existing_row(self) -> ExistingRow:
-        row = self.random_existing_row()
-        row.add_fake_data(skip_foreign_keys=True)
+        """
+        Random existing row with new values for its data columns. The same row is
+        regenerated by each call, so it must not be kept
+        """
+        if self._existing_row is None:
+            self._existing_row = ExistingRow(table_name=self.name, columns=self.columns)
+
+        row = self._existing_row
+        row.id = self.random_id()
+        row.randomise_data()
         return row
 
     def add_columns_from(self, table: "Table") -> None:
@@ -264,17 +449,29 @@ class Tables(list):
     @classmethod
     def from_repo(cls, repo_url: str, branch_name: str) -> "Tables":
         """Create a list of tables by traversing files from a cloned git repo"""
-        excluded_suffixes = ["Core.java", "info.java", "TemporalFrom.java"]
         repo_path = Path("star_repo")
 
         if not repo_path.exists():
             logger.info(f"Cloning {repo_path}")
             _ = git.Repo.clone_from(url=repo_url, to_path=repo_path, branch=branch_name)
 
+        tables = cls.from_directory(repo_path / "emap-star/emap-star/src/main")
+        logger.info(f"Created {len(tables)} tables from repo")
+        return tables
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> "Tables":
+        """
+        Create a list of tables from the Java entity classes in a directory, and any
+        of its subdirectories. Classes named *Core define columns of the tables that
+        extend them
+        """
+        excluded_suffixes = ["Core.java", "info.java", "TemporalFrom.java"]
+
         self = cls()
         superclasses = {}
 
-        for path in Path("star_repo/emap-star/emap-star/src/main").rglob("**/*.java"):
+        for path in Path(directory).rglob("**/*.java"):
 
             if path.name.endswith("Core.java"):
                 table = Table.from_java_file(path)
@@ -291,22 +488,64 @@ class Tables(list):
             for extend_table_name in table.extended_table_names:
                 table.add_columns_from(superclasses[extend_table_name])
 
-        logger.info(f"Created {len(self)} tables from repo")
         return self
 
-    def topologically_sorted(self) -> Generator:
-        """Tables in topologically sorted order given the foreign key references"""
-        logger.info("Sorting directed acyclic graph into topological order")
+    def copy(self) -> "Tables":
+        """
+        Independent copy of the tables, with their own numbers of rows and foreign
+        keys that reference the copied tables. Used to drive several schemas from
+        a single parse of the repo
+        """
+        return copy.deepcopy(self)
+
+    def named(self, name: str) -> Table:
+        """Table with a specific name"""
+        try:
+            return next(table for table in self if table.name == name)
+        except StopIteration:
+            raise KeyError(f"Failed to find a table named {name}")
+
+    def _foreign_key_graph(self) -> nx.DiGraph:
+        """Directed acyclic graph with edges from each table to those it references"""
 
         dag = nx.DiGraph()
         dag.add_nodes_from(range(len(self)))
 
         for i, table in enumerate(self):
-            for column in [col for col in table.columns if col.is_foreign_key]:
+            for column in table.foreign_key_columns:
                 logger.info(
                     f"{column.name:30s} is foreign key -> {column.table_reference.name}"
                 )
                 dag.add_edge(i, self.index(column.table_reference))
 
-        for node in reversed(list(nx.topological_sort(dag))):
+        return dag
+
+    def topologically_sorted(self) -> Generator:
+        """Tables in topologically sorted order given the foreign key references"""
+        logger.info("Sorting directed acyclic graph into topological order")
+
+        with phase("topological sort"):
+            nodes = list(nx.topological_sort(self._foreign_key_graph()))
+
+        for node in reversed(nodes):
             yield self[int(node)]
+
+    def topological_levels(self) -> List[List[Table]]:
+        """
+        Tables grouped by their depth in the foreign key graph. Tables in a level
+        only reference tables in previous levels, so can be populated concurrently
+        """
+        with phase("topological sort"):
+            dag = self._foreign_key_graph()
+            depths: Dict[int, int] = dict()
+
+            for node in reversed(list(nx.topological_sort(dag))):
+                depths[node] = 1 + max(
+                    (depths[n] for n in dag.successors(node)), default=-1
+                )
+
+        levels: List[List[Table]] = [[] for _ in range(max(depths.values()) + 1)]
+        for node, depth in depths.items():
+            levels[depth].append(self[int(node)])
+
+        return levels
@@ -13,8 +13,9 @@
 # limitations under the License.
 import re
 
+from datetime import date, datetime
 from time import time, sleep
-from typing import Callable
+from typing import Any, Callable
 
 from satellite._log import logger
 
@@ -36,6 +37,36 @@ def call_every_n_seconds(function: Callable, num_seconds: float) -> None:
         sleep_time = num_seconds - (time() - start_time)
 
         if sleep_time < 0:
-            logger.warning(f"Cannot call {function} fast enough! Delay time was -ve")
+            logger.warning(
+                f"Cannot call {function} fast enough! Delay time was -ve "
+                f"({num_seconds - sleep_time:.3f} s > {num_seconds:.3f} s)"
+            )
         else:
             sleep(sleep_time)
+
+
+def to_json_value(value: Any) -> Any:
+    """
+    Value of a column in a form that can be serialised as JSON. Datetimes, dates and
+    bytes are tagged so they can be restored by from_json_value
+    """
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    elif isinstance(value, date):
+        return {"date": value.isoformat()}
+    elif isinstance(value, bytes):
+        return {"bytes": value.hex()}
+    return value
+
+
+def from_json_value(value: Any) -> Any:
+    """Value of a column from its JSON form given by to_json_value"""
+    if not isinstance(value, dict):
+        return value
+    elif "datetime" in value:
+        return datetime.fromisoformat(value["datetime"])
+    elif "date" in value:
+        return date.fromisoformat(value["date"])
+    elif "bytes" in value:
+        return bytes.fromhex(value["bytes"])
+    raise ValueError(f"Cannot decode {value}")
@@ -0,0 +1,129 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import queue
+import signal
+import multiprocessing
+
+from time import monotonic, time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from satellite._log import logger
+from satellite._fake import fake, derived_seed
+from satellite._workload import Workload
+
+# Function that creates the workload of worker i of n, which reports its metrics
+# to a queue. Called in the worker process, so any connections are its own
+WorkloadFactory = Callable[[Tuple[int, int], Any], Workload]
+
+
+def _run_worker(
+    make_workload: WorkloadFactory,
+    partition: Tuple[int, int],
+    metrics: Any,
+    duration: Optional[float],
+) -> None:
+    fake.seed_instance(derived_seed("worker", partition[0]))
+    make_workload(partition, metrics).run(duration)
+
+
+def _exit(signum: int, frame: Any) -> None:
+    raise SystemExit(0)
+
+
+def _check_exit_codes(processes: List[Any]) -> None:
+    """Raise if any worker has exited other than normally or by being terminated"""
+    exit_codes = {
+        i: process.exitcode
+        for i, process in enumerate(processes)
+        if not process.is_alive() and process.exitcode not in (0, -signal.SIGTERM)
+    }
+    if len(exit_codes) > 0:
+        raise RuntimeError(
+            f"Workload workers failed with exit codes {exit_codes}. "
+            "See the log for details"
+        )
+
+
+def run_workers(
+    n_workers: int,
+    make_workload: WorkloadFactory,
+    duration: Optional[float] = None,
+    report_interval: float = 10.0,
+    state: Optional[Dict[str, Any]] = None,
+) -> Counter:
+    """
+    Run a workload partitioned over forked worker processes, each with its own
+    connections and faker seed. Metrics reported by the workers are aggregated and
+    logged by this process, and set in the state if it is given. Returns the total
+    number of each operation. The workers are stopped if this process is terminated
+    """
+    state = dict() if state is None else state
+    context = multiprocessing.get_context("fork")
+    metrics = context.Queue()
+    processes = [
+        context.Process(
+            target=_run_worker,
+            args=(make_workload, (i, n_workers), metrics, duration),
+            daemon=True,
+        )
+        for i in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+
+    n_operations: Dict[int, Counter] = dict()
+    n_failures: Dict[int, dict] = dict()
+    next_report_time = monotonic() + report_interval
+
+    # Exit normally on SIGTERM, e.g. from docker stop, so the workers are stopped
+    sigterm_handler = signal.signal(signal.SIGTERM, _exit)
+    try:
+        while any(process.is_alive() for process in processes) or not metrics.empty():
+            try:
+                worker, worker_operations, worker_failures = metrics.get(timeout=1.0)
+                n_operations[worker] = worker_operations
+                n_failures[worker] = worker_failures
+            except queue.Empty:
+                pass
+
+            _check_exit_codes(processes)  # Stops the other workers if one failed
+
+            n_alive = sum(process.is_alive() for process in processes)
+            state.update(
+                running=n_alive == n_workers,  # Degraded if any worker has exited
+                n_operations=sum(sum(c.values()) for c in n_operations.values()),
+                n_workers=n_alive,
+                failures={str(i): f for i, f in n_failures.items() if len(f) > 0},
+                refreshed_at=time(),
+            )
+
+            if monotonic() >= next_report_time:
+                next_report_time += report_interval
+                total: Counter = sum(n_operations.values(), Counter())
+                logger.info(
+                    f"Completed {sum(total.values())} operations over "
+                    f"{len(n_operations)}/{n_workers} workers"
+                )
+                if any(len(failures) > 0 for failures in n_failures.values()):
+                    logger.info(f"Failed statements by worker: {n_failures}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        state["running"] = False
+        signal.signal(signal.SIGTERM, sigterm_handler)
+
+    _check_exit_codes(processes)
+    return sum(n_operations.values(), Counter())
@@ -0,0 +1,364 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import heapq
+import itertools
+
+from time import monotonic, sleep, time
+from collections import Counter, deque
+from dataclasses import dataclass
+from multiprocessing import Queue
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from satellite._log import logger
+from satellite._fake import fake
+from satellite._clock import SimulatedClock
+from satellite._config import WorkloadConfig
+from satellite._replay import OperationLog
+from satellite._schema import DatabaseSchema, INSERT, UPDATE, DELETE, OPERATIONS
+from satellite._tables import Row, Table
+
+# Number of recently inserted primary keys retained for each table
+_N_RECENT_IDS = 1000
+
+# Probability that an operation targets a recent row, with a simulated clock
+_P_RECENT = 0.9
+
+# Distributions of the number of operations in a transaction, given a mean size
+TRANSACTION_SHAPES = ("fixed", "random")
+
+
+@dataclass
+class _Stream:
+    """Operations of a single type on a table, at a rate in rows per second"""
+
+    schema: DatabaseSchema  # In which the table is present
+    table: Table
+    operation: str
+    rate: float
+    max_num_rows: float = float("inf")  # Above which no rows are inserted
+
+
+class Workload:
+    """
+    Continuous inserts, updates and deletes of fake rows in a schema. Each operation
+    on each table is an independent stream of events, run in time order. With a
+    simulated clock events arrive at random with rates following the clock's cycles
+    and updates and new child rows mostly reference recently inserted rows. Rows
+    are sampled from the primary keys present in each table, which are maintained
+    as rows are inserted and deleted and periodically re-read from the database.
+    Streams may run on several schemas, each with their own copy of the tables.
+    A workload may be one partition of several run in parallel processes.
+    Operations on a schema may be grouped into transactions, each committed once it
+    reaches its size or the workload has caught up with its schedule
+    """
+
+    def __init__(
+        self,
+        schemas: List[DatabaseSchema],
+        streams: List[_Stream],
+        clock: Optional[SimulatedClock] = None,
+        refresh_interval: float = 10.0,
+        id_refresh_interval: float = 300.0,
+        log: Optional[OperationLog] = None,
+        partition: Tuple[int, int] = (0, 1),
+        metrics: Optional[Queue] = None,
+        transaction_size: int = 1,
+        transaction_shape: str = "fixed",
+    ):
+        if log is not None and (len(schemas) > 1 or partition[1] > 1):
+            raise ValueError("Cannot record the operations of more than one workload")
+
+        self._schemas = schemas
+        self._streams = streams
+        self._clock = clock
+        self._refresh_interval = refresh_interval
+        self._id_refresh_interval = id_refresh_interval  # Reading keys may be slow
+        self._log = log  # Records every successful operation
+
+        # Partition i of n runs 1/n of each rate and only updates and deletes rows
+        # with primary keys where key % n == i, so partitions never contend
+        self._partition = partition
+        self._metrics = metrics  # Receives the metrics of a partition on refresh
+
+        if transaction_shape not in TRANSACTION_SHAPES:
+            raise ValueError(f"Unknown transaction shape: {transaction_shape}")
+        self._transaction_size = transaction_size
+        self._transaction_shape = transaction_shape
+        # Number of operations remaining in the open transaction on each schema
+        self._n_remaining: Dict[DatabaseSchema, int] = dict()
+
+        self._recent_ids: Dict[Table, Deque[int]] = {
+            table: deque(maxlen=_N_RECENT_IDS)
+            for schema in schemas
+            for table in schema.tables
+        }
+        self.n_operations: Counter = Counter()  # Keyed on (operation, table name)
+        self._lag = 0.0  # Seconds behind schedule
+
+        # Snapshot of progress, set on each refresh so it can be read from any thread
+        self.state: Dict[str, Any] = {"running": False}
+
+    @classmethod
+    def with_rates(
+        cls,
+        schemas: List[DatabaseSchema],
+        rates: Dict[str, float],
+        max_num_rows: float,
+        **kwargs: Any,
+    ) -> "Workload":
+        """Workload with the same rate of each operation on every table"""
+        streams = [
+            _Stream(
+                schema,
+                table,
+                operation,
+                rate=rates[operation],
+                max_num_rows=max_num_rows,
+            )
+            for schema in schemas
+            for table in schema.tables
+            for operation in OPERATIONS
+            if rates[operation] > 0
+        ]
+        return cls(schemas=schemas, streams=streams, **kwargs)
+
+    @classmethod
+    def from_config(
+        cls,
+        schemas: List[DatabaseSchema],
+        config: WorkloadConfig,
+        default_rates: Dict[str, float],
+        max_num_rows: float,
+        **kwargs: Any,
+    ) -> "Workload":
+        """Workload with rates and row limits for each table defined by a config"""
+        table_names = [table.name for table in schemas[0].tables]
+        config.check_table_names(table_names)
+
+        streams = []
+        for schema in schemas:
+            for table, operation in itertools.product(schema.tables, OPERATIONS):
+                rate = config.rate(
+                    table.name, operation, table_names, default=default_rates[operation]
+                )
+                if rate <= 0:
+                    continue
+
+                streams.append(
+                    _Stream(
+                        schema,
+                        table,
+                        operation,
+                        rate=rate,
+                        max_num_rows=config.max_num_rows(table.name, max_num_rows),
+                    )
+                )
+
+        return cls(schemas=schemas, streams=streams, **kwargs)
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Run the workload for a duration in seconds, or forever if undefined"""
+        if len(self._streams) == 0:
+            logger.info("Not running any operations. All rates were zero")
+            return
+
+        start_time = next_refresh_time = next_id_refresh_time = monotonic()
+        end_time = float("inf") if duration is None else start_time + duration
+
+        queue = [
+            (start_time + self._interval(stream), i, stream)
+            for i, stream in enumerate(self._streams)
+        ]
+        heapq.heapify(queue)
+
+        while (next_time := queue[0][0]) < end_time:
+            _, i, stream = queue[0]
+            heapq.heapreplace(queue, (next_time + self._interval(stream), i, stream))
+
+            if (delay := next_time - monotonic()) > 0:
+                self._commit()  # Caught up, so end the transactions of this tick
+                sleep(delay)
+            self._lag = max(self._lag, -delay)
+
+            if monotonic() >= next_refresh_time:
+                self._commit()
+                self._refresh()
+                next_refresh_time += self._refresh_interval
+
+            if monotonic() >= next_id_refresh_time:
+                self._commit()
+                for schema in self._schemas:
+                    schema.update_live_ids_in_tables(partition=self._partition)
+                next_id_refresh_time += self._id_refresh_interval
+
+            self._execute(stream)
+
+        self._commit()
+        self._refresh()
+        self.state = {**self.state, "running": False}
+
+    def _interval(self, stream: _Stream) -> float:
+        """Time in seconds until the next operation of a stream"""
+        rate = stream.rate / self._partition[1]
+        if self._clock is None:
+            return 1.0 / rate
+
+        rate *= self._clock.rate_multiplier()
+        return fake.random.expovariate(rate)
+
+    def _refresh(self) -> None:
+        """Synchronise the number of rows in each table and report progress"""
+        if self._lag > 1.0:
+            logger.warning(
+                f"Cannot run operations fast enough! {self._lag:.1f} s behind"
+            )
+        lag, self._lag = self._lag, 0.0
+
+        for schema in self._schemas:
+            schema.update_num_rows_in_tables()
+
+        n_failures = {
+            f"{schema.database_name}.{schema.schema_name}": dict(schema.n_failures)
+            for schema in self._schemas
+            if len(schema.n_failures) > 0
+        }
+        self.state = {
+            "running": True,
+            "n_operations": sum(self.n_operations.values()),
+            "lag_seconds": round(lag, 3),
+            "failures": n_failures,
+            "refreshed_at": time(),
+        }
+        if self._metrics is not None:
+            self._metrics.put(
+                (self._partition[0], Counter(self.n_operations), n_failures)
+            )
+            return
+
+        logger.info(f"Completed {sum(self.n_operations.values())} operations")
+        if len(n_failures) > 0:
+            logger.info(f"Failed statements: {n_failures}")
+
+    def _commit(self) -> None:
+        """Commit the open transactions on all schemas"""
+        for schema in self._schemas:
+            if schema.in_transaction:
+                schema.commit()
+
+    def _next_transaction_size(self) -> int:
+        size = self._transaction_size
+        if self._transaction_shape == "random" and size > 1:  # Geometric, mean size
+            size = 1 + int(fake.random.expovariate(1.0 / (size - 0.5)))
+        return size
+
+    def _begin(self, schema: DatabaseSchema) -> None:
+        self._n_remaining[schema] = self._next_transaction_size()
+        schema.begin()
+
+    def _execute(self, stream: _Stream) -> None:
+        table, schema = stream.table, stream.schema
+        logger.debug(f"Running {stream.operation} on {table.name}")
+
+        if self._transaction_size > 1 and not schema.in_transaction:
+            self._begin(schema)
+
+        if stream.operation == INSERT:
+            self._insert(stream)
+        elif stream.operation == UPDATE:
+            self._update(stream)
+        elif stream.operation == DELETE:
+            self._delete(stream)
+        else:
+            raise ValueError(f"Unknown operation: {stream.operation}")
+
+        self.n_operations[(stream.operation, table.name)] += 1
+
+        if schema.in_transaction:
+            self._n_remaining[schema] -= 1
+            if self._n_remaining[schema] <= 0:
+                schema.commit()
+
+    def _recent_id(self, table: Table) -> Optional[int]:
+        """Recently inserted primary key of a table, if targeting a recent row"""
+        ids = self._recent_ids[table]
+        if self._clock is None or len(ids) == 0 or fake.random.random() > _P_RECENT:
+            return None
+
+        _id = ids[fake.random.randrange(len(ids))]
+        if table.live_ids is not None and _id not in table.live_ids:
+            return None  # Since deleted
+
+        return _id
+
+    def _reference_recent_rows(self, row: Row) -> None:
+        for column in row.non_pk_columns:
+            if column.is_foreign_key:
+                _id = self._recent_id(column.table_reference)  # type: ignore
+                if _id is not None:
+                    row[column] = _id
+
+    def _in_partition(self, _id: int) -> bool:
+        index, n_partitions = self._partition
+        return _id % n_partitions == index
+
+    def _insert(self, stream: _Stream) -> None:
+        table = stream.table
+        if table.n_rows >= stream.max_num_rows:
+            return
+
+        row = table.fake_row()
+        self._reference_recent_rows(row)
+
+        if (_id := stream.schema.insert(row)) is not None:
+            table.n_rows += 1
+            if self._in_partition(_id):
+                self._recent_ids[table].append(_id)
+                if table.live_ids is not None:
+                    table.live_ids.add(_id)
+
+            if self._log is not None:
+                values = tuple(row[column] for column in row.non_pk_columns)
+                self._log.record(INSERT, table.name, _id, values)
+
+    def _update(self, stream: _Stream) -> None:
+        table = stream.table
+        row = table.randomised_existing_row()
+        if (recent_id := self._recent_id(table)) is not None:
+            row.id = recent_id
+
+        if row.id is None:
+            return
+
+        if not stream.schema.update(row):
+            return
+
+        if self._log is not None:
+            columns = row.updated_columns
+            values = tuple(row[column] for column in columns)
+            names = (
+                () if columns == row.data_columns else tuple(c.name for c in columns)
+            )
+            self._log.record(UPDATE, table.name, row.id, values, names)
+
+    def _delete(self, stream: _Stream) -> None:
+        table = stream.table
+        row = table.random_existing_row()
+        if not stream.schema.delete(row):
+            return
+
+        if table.live_ids is not None:
+            table.live_ids.remove(row.id)  # type: ignore
+
+        if self._log is not None:
+            self._log.record(DELETE, table.name, row.id)
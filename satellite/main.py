@@ -13,9 +13,32 @@
 # limitations under the License.
 import click
 
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
 from satellite._log import logger
-from satellite._schema import DatabaseSchema
-from satellite._tables import Tables
+from satellite._checkpoint import Checkpoint
+from satellite._clock import SimulatedClock, use_clock
+from satellite._config import WorkloadConfig
+from satellite._replay import OperationLog, replay as replay_operations
+from satellite._schema import DatabaseSchema, INSERT, UPDATE, DELETE
+from satellite._server_side import ServerSideGenerator
+from satellite._workload import Workload, TRANSACTION_SHAPES
+from satellite._workers import run_workers
+from satellite._reads import ReadWorkload
+from satellite._health import serve_health
+from satellite._output import open_output, suffix_for, COMPRESSIONS
+from satellite._export import export_table, FORMATS
+from satellite._profile import Profile, PROFILERS
+from satellite._benchmark import (
+    run_benchmark,
+    scaling_exponents,
+    write_results,
+    SUPERCLASSES,
+)
+from satellite._tables import Table, Tables
 from satellite._settings import EnvVar
 from satellite._utils import call_every_n_seconds
 
@@ -35,8 +58,62 @@ star = DatabaseSchema(
 
 
 @click.group()
-def cli() -> None:
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Profile the command, writing the profile to this file when it exits. "
+    "Time spent in each phase of work is also logged",
+)
+@click.option(
+    "--profiler",
+    type=click.Choice(PROFILERS),
+    default="sample",
+    show_default=True,
+    help="sample writes collapsed stacks, e.g. for flamegraph.pl. cprofile writes "
+    "pstats output",
+)
+@click.option(
+    "--sample-interval",
+    default=0.005,
+    show_default=True,
+    help="Seconds between the stack samples of the sample profiler",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    profile_path: Optional[Path],
+    profiler: str,
+    sample_interval: float,
+) -> None:
     """Satellite command line interface"""
+    if profile_path is not None:
+        profile = Profile(profile_path, profiler=profiler, interval=sample_interval)
+        profile.start()
+        ctx.call_on_close(profile.stop)
+
+
+target_option = click.option(
+    "--target",
+    "targets",
+    multiple=True,
+    help="Schema as DATABASE:SCHEMA, or SCHEMA in DATABASE_NAME. May be repeated. "
+    "Defaults to STAR_SCHEMA_NAME in DATABASE_NAME",
+)
+
+
+def _target_schemas(targets: Tuple[str, ...]) -> List[DatabaseSchema]:
+    """Schemas for each target, all using the tables parsed for the star schema"""
+    if len(targets) == 0:
+        return [star]
+
+    schemas = []
+    for target in targets:
+        database_name, _, name = target.rpartition(":")
+        schemas.append(star.with_target(database_name or star.database_name, name))
+
+    return schemas
 
 
 @cli.command()
@@ -45,19 +122,325 @@ def print_db_create_command() -> None:
 
 
 @cli.command()
-def print_create_command() -> None:
-    """Print an SQL table create command for an EMAP Star schem"""
+@click.option(
+    "--output",
+    "-o",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File to write to. Defaults to stdout",
+)
+@click.option(
+    "--split-dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory in which to write one file per table, numbered in load order",
+)
+@click.option(
+    "--compression",
+    default="none",
+    type=click.Choice(COMPRESSIONS),
+    help="Compression applied to the output",
+)
+@click.option(
+    "--chunk-size",
+    default=10_000,
+    type=int,
+    help="Number of rows generated and written in a single INSERT command",
+)
+@click.option(
+    "--server-side",
+    is_flag=True,
+    help="Generate the data within postgres from generate_series",
+)
+@click.option(
+    "--index-foreign-keys",
+    is_flag=True,
+    help="Create an index on every foreign key column once the data is loaded",
+)
+def print_create_command(
+    output: Optional[Path],
+    split_dir: Optional[Path],
+    compression: str,
+    chunk_size: int,
+    server_side: bool,
+    index_foreign_keys: bool,
+) -> None:
+    """
+    Print an SQL table create command for an EMAP Star schema. With --server-side
+    the commands generate the data when they are run, rather than containing it
+    """
+    generator = ServerSideGenerator(star.schema_name) if server_side else None
 
-    print(star.schema_create_command)
+    def write_table(file: TextIO, table: Table) -> None:
+        print(star.empty_table_create_command_for(table), file=file)
 
-    for table in star.tables.topologically_sorted():
-        table.add_fake_data()
-        print(star.empty_table_create_command_for(table))
-        print(star.add_data_command_for(table))
+        if generator is None:
+            commands = star.add_data_commands_for(table, chunk_size=chunk_size)
+        else:
+            commands = generator.insert_commands_for(table, chunk_size=chunk_size)
+
+        for command in commands:
+            print(command, file=file)
+
+        if index_foreign_keys:
+            for command in star.foreign_key_index_commands_for(table):
+                print(command, file=file)
+
+    def write_schema(file: TextIO) -> None:
+        print(star.schema_create_command, file=file)
+        if generator is not None:
+            for command in generator.lookup_create_commands(star.tables):
+                print(command, file=file)
+
+    tables = list(star.tables.topologically_sorted())
+
+    if split_dir is None:
+        with open_output(output, compression) as file:
+            write_schema(file)
+            for table in tables:
+                write_table(file, table)
+            if generator is not None:
+                print(generator.lookup_drop_command, file=file)
+
+    else:
+        split_dir.mkdir(parents=True, exist_ok=True)
+        suffix = f".sql{suffix_for(compression)}"
+
+        with open_output(split_dir / f"0001_schema{suffix}", compression) as file:
+            write_schema(file)
+
+        for i, table in enumerate(tables, start=2):
+            filepath = split_dir / f"{i:04d}_{table.name}{suffix}"
+            with open_output(filepath, compression) as file:
+                print(star.connect_command, file=file)
+                write_table(file, table)
+
+        if generator is not None:
+            filepath = split_dir / f"{len(tables) + 2:04d}_cleanup{suffix}"
+            with open_output(filepath, compression) as file:
+                print(star.connect_command, file=file)
+                print(generator.lookup_drop_command, file=file)
 
     logger.info("Successfully printed fake tables")
 
 
+@cli.command()
+@click.argument(
+    "directory", type=click.Path(file_okay=False, path_type=Path), default="."
+)
+@click.option(
+    "--format",
+    "file_format",
+    default="csv",
+    type=click.Choice(FORMATS),
+    help="Format of the file written for each table",
+)
+@click.option(
+    "--compression",
+    default="none",
+    type=click.Choice(COMPRESSIONS),
+    help="Compression applied to each file",
+)
+@click.option(
+    "--chunk-size",
+    default=100_000,
+    type=int,
+    help="Number of rows generated at once. A row group in a parquet file",
+)
+def export(
+    directory: Path, file_format: str, compression: str, chunk_size: int
+) -> None:
+    """
+    Write N_TABLE_ROWS of fake data for each table to a file in a directory, without
+    a database. The data, including primary keys, are those loaded by populate
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for table in star.tables.topologically_sorted():
+        export_table(table, directory, file_format, compression, chunk_size)
+
+    logger.info(f"Successfully exported all tables to {directory}")
+
+
+@cli.command()
+@click.option(
+    "--n-connections",
+    default=4,
+    type=int,
+    help="Maximum number of tables loaded concurrently, each on its own connection",
+)
+@click.option(
+    "--chunk-size",
+    default=10_000,
+    type=int,
+    help="Number of rows inserted in a single transaction",
+)
+@click.option(
+    "--defer-constraints",
+    is_flag=True,
+    help="Add foreign key constraints only once all the data is loaded",
+)
+@click.option(
+    "--bulk",
+    is_flag=True,
+    help="Load into unlogged tables without constraints, then add the primary and "
+    "foreign keys, make the tables logged and analyze them",
+)
+@click.option(
+    "--index-foreign-keys",
+    is_flag=True,
+    help="Create an index on every foreign key column once the data is loaded",
+)
+@click.option(
+    "--server-side",
+    is_flag=True,
+    help="Generate the data within postgres from generate_series",
+)
+@target_option
+def populate(
+    n_connections: int,
+    chunk_size: int,
+    defer_constraints: bool,
+    bulk: bool,
+    index_foreign_keys: bool,
+    server_side: bool,
+    targets: Tuple[str, ...],
+) -> None:
+    """
+    Create the schema in a running database and load N_TABLE_ROWS of fake data into
+    each table. Tables at the same depth of the foreign key graph load concurrently,
+    or all tables if the constraints are added after loading
+    """
+    for schema in _target_schemas(targets):
+        _populate(
+            schema,
+            n_connections,
+            chunk_size,
+            defer_constraints,
+            bulk,
+            index_foreign_keys,
+            server_side,
+        )
+
+    logger.info("Successfully populated all tables")
+
+
+def _populate(
+    schema: DatabaseSchema,
+    n_connections: int,
+    chunk_size: int,
+    defer_constraints: bool,
+    bulk: bool,
+    index_foreign_keys: bool,
+    server_side: bool,
+) -> None:
+    if not schema.is_connected:
+        raise RuntimeError(f"Failed to connect to {schema.database_name}")
+
+    logger.info(f"Populating {schema.database_name}.{schema.schema_name}")
+    defer_constraints = defer_constraints or bulk
+    schema.recreate(with_foreign_keys=not defer_constraints, bulk=bulk)
+
+    generator = ServerSideGenerator(schema.schema_name) if server_side else None
+    if generator is not None:
+        schema.execute_commands(generator.lookup_create_commands(schema.tables))
+
+    def load(table: Table) -> None:
+        connected_schema = schema.connected_copy()
+        try:
+            connected_schema.load(table, chunk_size=chunk_size, server_side=generator)
+            if bulk:  # Other tables need not be loaded, as there are no foreign keys
+                connected_schema.execute_commands(
+                    [connected_schema.bulk_load_finish_command_for(table)]
+                )
+        finally:
+            connected_schema.close()
+
+    if defer_constraints:  # Foreign keys are not checked so tables load in any order
+        levels = [list(schema.tables)]
+    else:
+        levels = schema.tables.topological_levels()
+
+    with ThreadPoolExecutor(max_workers=n_connections) as executor:
+        for level in levels:
+            logger.info(f"Loading {[table.name for table in level]}")
+            list(executor.map(load, level))  # Wait for the level to complete
+
+    if generator is not None:
+        schema.execute_commands([generator.lookup_drop_command])
+
+    if defer_constraints:
+        logger.info("Adding foreign keys")
+        schema.add_foreign_keys()
+
+    if index_foreign_keys:
+        schema.add_foreign_key_indexes()
+
+    if bulk:
+        schema.analyze()
+
+
+@cli.command()
+@click.option(
+    "--chunk-size",
+    default=10_000,
+    type=int,
+    help="Number of rows inserted in a single transaction",
+)
+@click.option(
+    "--checkpoint",
+    "checkpoint_path",
+    default="satellite_checkpoint.json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File used to record the progress of the load",
+)
+@click.option(
+    "--index-foreign-keys",
+    is_flag=True,
+    help="Create an index on every foreign key column once the data is loaded",
+)
+def top_up(chunk_size: int, checkpoint_path: Path, index_foreign_keys: bool) -> None:
+    """
+    Incrementally load fake data into a database, creating the schema and tables if
+    required and inserting only the rows needed for each table to have N_TABLE_ROWS.
+    An interrupted load is resumed when the command is run again
+    """
+    if not star.is_connected:
+        raise RuntimeError(f"Failed to connect to {star.database_name}")
+
+    n_table_rows = int(EnvVar("N_TABLE_ROWS").or_default())
+    checkpoint = Checkpoint(
+        checkpoint_path, key=f"{star.database_name}.{star.schema_name}"
+    )
+
+    star.create_if_not_exists()
+    star.update_num_rows_in_tables()
+
+    for table in star.tables.topologically_sorted():
+        first_row = checkpoint.next_row(table.name, default=table.n_rows)
+        # Foreign keys reference rows present now, not rows that have been deleted
+        star.update_live_ids_in_tables()
+
+        while table.n_rows < n_table_rows:
+            n_rows = min(chunk_size, n_table_rows - table.n_rows)
+            chunk = table.fake_chunk(first_row=first_row, n_rows=n_rows)
+            if not star.insert_chunk(chunk):
+                raise RuntimeError(
+                    f"Failed to insert rows {first_row}-{first_row + n_rows} of "
+                    f"{table.name}. See the log for details. Progress is saved, so "
+                    "the load resumes from this chunk when run again"
+                )
+
+            table.n_rows += n_rows
+            first_row += n_rows
+            checkpoint.update(table.name, next_row=first_row)
+
+    if index_foreign_keys:
+        star.add_foreign_key_indexes()
+
+    logger.info(f"Successfully topped up all tables to {n_table_rows} rows")
+
+
 @cli.command()
 @click.option(
     "--max-num-rows",
@@ -134,6 +517,330 @@ def continuously_delete() -> None:
     call_every_n_seconds(delete, num_seconds=time_delay)
 
 
+@cli.command()
+@click.option(
+    "--max-num-rows",
+    default=1e8,
+    type=int,
+    help="Number of rows above which no more are inserted",
+)
+@click.option(
+    "--temporal",
+    is_flag=True,
+    help="Use a simulated clock for timestamps and rates following daily cycles",
+)
+@click.option(
+    "--clock-start",
+    default="2023-01-01",
+    type=click.DateTime(),
+    help="Start time of the simulated clock",
+)
+@click.option(
+    "--clock-speed",
+    default=1.0,
+    type=float,
+    help="Number of simulated seconds per real second",
+)
+@click.option(
+    "--config",
+    "config_path",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="TOML file defining rates and maximum numbers of rows for each table",
+)
+@click.option(
+    "--record",
+    "record_path",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File in which to record every operation, for a later replay",
+)
+@click.option(
+    "--workers",
+    default=1,
+    type=int,
+    help="Number of processes over which the workload is partitioned",
+)
+@click.option(
+    "--transaction-size",
+    default=1,
+    type=int,
+    help="Number of operations grouped into a transaction, or the mean number if "
+    "the shape is random. Transactions are also committed when the workload is idle",
+)
+@click.option(
+    "--transaction-shape",
+    default="fixed",
+    type=click.Choice(TRANSACTION_SHAPES),
+    help="Distribution of the number of operations in each transaction",
+)
+@click.option(
+    "--publication",
+    default=None,
+    type=str,
+    help="Name of a publication of all tables to create for logical replication",
+)
+@click.option(
+    "--health-port",
+    default=None,
+    type=int,
+    help="Port on which to serve the state of the workload as JSON at /health",
+)
+@target_option
+def run(
+    max_num_rows: int,
+    temporal: bool,
+    clock_start: datetime,
+    clock_speed: float,
+    config_path: Optional[Path],
+    record_path: Optional[Path],
+    targets: Tuple[str, ...],
+    workers: int,
+    transaction_size: int,
+    transaction_shape: str,
+    publication: Optional[str],
+    health_port: Optional[int],
+) -> None:
+    """
+    Continuously insert, update and delete rows in all tables at rates defined by
+    INSERT_RATE, UPDATE_RATE and DELETE_RATE in rows per second per table, or for
+    each table by a configuration file. Each target schema runs the same workload
+    """
+    schemas = _target_schemas(targets)
+    if record_path is not None and len(schemas) > 1:
+        raise click.UsageError("Cannot --record the operations on multiple targets")
+    if record_path is not None and workers > 1:
+        raise click.UsageError("Cannot --record the operations of multiple workers")
+
+    clock = SimulatedClock(start=clock_start, speed=clock_speed) if temporal else None
+    use_clock(clock)
+
+    rates = {
+        INSERT: float(EnvVar("INSERT_RATE").or_else(0)),
+        UPDATE: float(EnvVar("UPDATE_RATE").or_else(0)),
+        DELETE: float(EnvVar("DELETE_RATE").or_else(0)),
+    }
+    log = None if record_path is None else OperationLog(record_path)
+
+    config = None if config_path is None else WorkloadConfig.from_file(config_path)
+
+    if publication is not None:
+        for schema in schemas:
+            schema.create_publication(publication)
+
+    def make_workload(
+        partition: Tuple[int, int] = (0, 1), metrics: Optional[Any] = None
+    ) -> Workload:
+        if partition[1] > 1:  # In a worker process, which needs its own connections
+            _schemas = [schema.connected_copy() for schema in schemas]
+        else:
+            _schemas = schemas
+
+        kwargs = dict(
+            clock=clock,
+            log=log,
+            partition=partition,
+            metrics=metrics,
+            transaction_size=transaction_size,
+            transaction_shape=transaction_shape,
+        )
+        if config is None:
+            return Workload.with_rates(
+                _schemas, rates=rates, max_num_rows=max_num_rows, **kwargs
+            )
+
+        return Workload.from_config(
+            _schemas,
+            config=config,
+            default_rates=rates,
+            max_num_rows=max_num_rows,
+            **kwargs,
+        )
+
+    if workers > 1:
+        state: Dict[str, Any] = {"running": False}
+        if health_port is not None:
+            serve_health(health_port, lambda: dict(state))
+        run_workers(workers, make_workload, state=state)
+        return
+
+    workload = make_workload()
+    if health_port is not None:
+        serve_health(health_port, lambda: workload.state)
+    try:
+        workload.run()
+    finally:
+        if log is not None:
+            log.close()
+
+
+@cli.command()
+@click.argument(
+    "log_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.option(
+    "--speed",
+    default=1.0,
+    type=float,
+    help="Multiple of the recorded speed. Zero replays as fast as possible",
+)
+@click.option(
+    "--batch-size",
+    default=1000,
+    type=int,
+    help="Maximum number of operations executed in a single transaction",
+)
+def replay(log_path: Path, speed: float, batch_size: int) -> None:
+    """
+    Replay operations recorded by satellite run --record against the database. The
+    database should be in the state it was when the recording started
+    """
+    assert star.exists
+    replay_operations(star, log_path, speed=speed, max_batch_size=batch_size)
+
+
+@cli.command()
+@click.option(
+    "--n-tables",
+    multiple=True,
+    default=(10, 30, 100),
+    type=int,
+    show_default=True,
+    help="Number of tables in a synthetic schema. May be repeated",
+)
+@click.option(
+    "--n-columns",
+    multiple=True,
+    default=(10,),
+    type=int,
+    show_default=True,
+    help="Number of data columns in each table. May be repeated",
+)
+@click.option(
+    "--n-rows",
+    multiple=True,
+    default=(100,),
+    type=int,
+    show_default=True,
+    help="Number of rows generated for each table. May be repeated",
+)
+@click.option(
+    "--fk-depth",
+    default=2,
+    show_default=True,
+    help="Length of the longest chain of foreign keys",
+)
+@click.option(
+    "--superclass",
+    default="AuditCore",
+    type=click.Choice(SUPERCLASSES),
+    show_default=True,
+    help="Class extended by every table",
+)
+@click.option(
+    "--output",
+    "output_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="CSV file to write the time of each stage for every size to",
+)
+def benchmark(
+    n_tables: Tuple[int, ...],
+    n_columns: Tuple[int, ...],
+    n_rows: Tuple[int, ...],
+    fk_depth: int,
+    superclass: str,
+    output_path: Optional[Path],
+) -> None:
+    """
+    Time parsing, sorting, data generation and SQL emission for synthetic schemas of
+    every combination of sizes, and how each scales with the size. No database is
+    required
+    """
+    results = run_benchmark(n_tables, n_columns, n_rows, fk_depth, superclass)
+
+    for (stage, parameter), exponent in scaling_exponents(results).items():
+        log = logger.warning if exponent > 1.2 else logger.info  # Superlinear
+        log(f"{stage} time ~ {parameter}^{exponent:.2f}")
+
+    if output_path is not None:
+        write_results(results, output_path)
+        logger.info(f"Wrote results to {output_path}")
+
+
+@cli.command()
+@click.option(
+    "--threads",
+    "n_threads",
+    default=4,
+    show_default=True,
+    help="Number of concurrent readers, sharing a pool of connections",
+)
+@click.option(
+    "--rate",
+    default=0.0,
+    type=float,
+    help="Total number of queries per second. Zero reads as fast as possible",
+)
+@click.option(
+    "--duration",
+    default=None,
+    type=float,
+    help="Seconds to read for. Reads forever if undefined",
+)
+@click.option(
+    "--report-interval",
+    default=10.0,
+    show_default=True,
+    help="Seconds between reports of the latency percentiles",
+)
+@click.option(
+    "--child-limit",
+    default=100,
+    show_default=True,
+    help="Maximum number of children returned by each parent to child join",
+)
+def read(
+    n_threads: int,
+    rate: float,
+    duration: Optional[float],
+    report_interval: float,
+    child_limit: int,
+) -> None:
+    """
+    Continuously look up rows by primary key and join them along each foreign key,
+    reporting the latency percentiles of each query. Run alongside satellite run to
+    measure read latency under write load
+    """
+    assert star.exists
+    ReadWorkload(
+        star,
+        n_threads=n_threads,
+        rate=rate,
+        report_interval=report_interval,
+        child_limit=child_limit,
+    ).run(duration)
+
+
 @cli.command()
 def schema_exists() -> None:
     return print(star.exists)
+
+
+@cli.command()
+@click.option(
+    "--timeout",
+    default=None,
+    type=float,
+    help="Seconds to wait before failing. Waits forever if undefined",
+)
+def wait_for_db(timeout: Optional[float]) -> None:
+    """
+    Wait until the database is accepting connections and the schema exists, polling
+    with backoff from this process
+    """
+    if not star.wait_until_exists(timeout=timeout):
+        raise click.ClickException(
+            f"{star.schema_name} did not exist within {timeout} seconds"
+        )
+    logger.info(f"{star.schema_name} exists")
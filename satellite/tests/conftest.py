@@ -0,0 +1,54 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import pytest
+
+from satellite._schema import DatabaseSchema
+from satellite._settings import EnvVar
+from satellite.main import star
+
+
+@pytest.fixture
+def database_schema():
+    """
+    Empty schema in the database named by TEST_DATABASE_NAME, which is dropped after
+    the test. Tests using it are skipped if no test database is available
+    """
+    database_name = os.environ.get("TEST_DATABASE_NAME")
+    if database_name is None:
+        pytest.skip("TEST_DATABASE_NAME is not set")
+
+    schema = DatabaseSchema(
+        name="satellite_test",
+        tables=star.tables.copy(),
+        database_name=database_name,
+        host=EnvVar("POSTGRES_HOST").or_default(),
+        username=EnvVar("POSTGRES_USER").unwrap(),
+        password=EnvVar("POSTGRES_PASSWORD").unwrap(),
+    )
+    if not schema.is_connected:
+        pytest.skip(f"Cannot connect to {database_name}")
+
+    for table in schema.tables:
+        table.n_rows = 0
+    schema.recreate()
+    yield schema
+
+    schema.execute_commands(
+        [
+            "DROP PUBLICATION IF EXISTS satellite_test;",
+            "DROP SCHEMA IF EXISTS satellite_test CASCADE;",
+        ]
+    )
+    schema.close()
@@ -0,0 +1,64 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+import psycopg2
+
+from satellite._benchmark import (
+    BenchmarkResult,
+    run_benchmark,
+    scaling_exponents,
+    write_synthetic_entities,
+)
+from satellite._tables import Tables
+
+
+@pytest.mark.parametrize("superclass, n_extra_columns", [("none", 0), ("AuditCore", 4)])
+def test_synthetic_entities_define_a_schema(tmp_path, superclass, n_extra_columns):
+
+    write_synthetic_entities(
+        tmp_path, n_tables=7, n_columns=9, fk_depth=3, superclass=superclass
+    )
+    tables = Tables.from_directory(tmp_path)
+
+    assert sorted(table.name for table in tables) == [f"entity{i}" for i in range(7)]
+    assert len(tables.topological_levels()) == 3 + 1
+
+    for table in tables:
+        n_foreign_keys = len(table.foreign_key_columns)
+        assert n_foreign_keys == (0 if table.name in ("entity0", "entity4") else 1)
+        assert len(table.columns) == 1 + n_foreign_keys + 9 + n_extra_columns
+
+
+def test_all_stages_are_timed_for_each_size(monkeypatch):
+    def connect(*args, **kwargs):
+        raise AssertionError("The benchmark must not connect to a database")
+
+    monkeypatch.setattr(psycopg2, "connect", connect)
+    results = run_benchmark(n_tables=[2, 4], n_columns=[3], n_rows=[5])
+
+    assert [result.n_tables for result in results] == [2, 4]
+    assert all(result.generate > 0 and result.emit > 0 for result in results)
+
+
+def test_scaling_exponents():
+
+    results = [
+        BenchmarkResult(n_tables=n, n_columns=1, n_rows=1, parse=n**2, emit=3 * n)
+        for n in (10, 100, 1000)
+    ]
+    exponents = scaling_exponents(results)
+
+    assert exponents[("parse", "n_tables")] == pytest.approx(2.0)
+    assert exponents[("emit", "n_tables")] == pytest.approx(1.0)
+    assert ("parse", "n_rows") not in exponents  # Not varied
@@ -0,0 +1,32 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import tempfile
+
+from pathlib import Path
+from satellite._checkpoint import Checkpoint
+
+
+def test_checkpoint_is_persisted():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = Path(dir_name, "checkpoint.json")
+
+        checkpoint = Checkpoint(filepath, key="emap.star")
+        assert checkpoint.next_row("mrn", default=3) == 3
+
+        checkpoint.update("mrn", next_row=10)
+        assert Checkpoint(filepath, key="emap.star").next_row("mrn", default=3) == 10
+
+        # Progress is independent for different schemas
+        assert Checkpoint(filepath, key="emap.other").next_row("mrn", default=0) == 0
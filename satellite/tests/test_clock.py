@@ -0,0 +1,37 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+from datetime import datetime, timedelta
+from satellite._clock import SimulatedClock
+
+
+def test_simulated_clock_runs_faster_than_real_time():
+
+    start = datetime(2023, 1, 1)
+    clock = SimulatedClock(start=start, speed=1e6)
+
+    first, second = clock.now(), clock.now()
+    assert start <= first <= second
+    assert clock.speed == 1e6
+
+
+def test_rate_multiplier_averages_to_one_over_a_week():
+
+    clock = SimulatedClock(start=datetime(2023, 1, 2))
+    times = [datetime(2023, 1, 2) + timedelta(minutes=i) for i in range(7 * 24 * 60)]
+    multipliers = [clock.rate_multiplier(at=t) for t in times]
+
+    assert abs(sum(multipliers) / len(multipliers) - 1.0) < 0.01
+    assert clock.rate_multiplier(datetime(2023, 1, 2, 14)) > clock.rate_multiplier(
+        datetime(2023, 1, 2, 3)
+    )
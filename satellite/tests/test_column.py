@@ -11,6 +11,8 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  See the License for the specific language governing permissions and
 # limitations under the License.
+from datetime import date
+
 from satellite._column import Column
 
 
@@ -25,3 +27,15 @@ def test_boolean_column():
     assert not column.is_foreign_key
     assert not column.is_primary_key
     assert column.faker_method() in (True, False)
+
+
+def test_sql_literals_are_escaped():
+
+    column = Column(name="lastname", java_type="String", parent_table_name="mrn")
+    assert column.sql_literals(["O'Brien", None]) == ["'O''Brien'", "null"]
+
+    column = Column(name="photo", java_type="byte[]", parent_table_name="location")
+    assert column.sql_literals([b"\\'"]) == ["'\\x5c27'"]
+
+    column = Column(name="date_of_birth", java_type="LocalDate", parent_table_name="x")
+    assert column.sql_literals([date(2000, 1, 2)]) == ["'2000-01-02'"]
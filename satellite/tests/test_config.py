@@ -0,0 +1,72 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import tempfile
+
+from pathlib import Path
+from satellite._config import WorkloadConfig
+
+CONFIG_TOML = """
+[defaults]
+insert_rate = 1.0
+max_num_rows = 100
+
+[totals]
+update_rate = 12.0
+
+[tables.visit_observation]
+insert_rate = 50.0
+update_weight = 2.0
+max_num_rows = 1000
+
+[tables.mrn]
+update_rate = 0.0
+"""
+
+
+def test_rates_from_config():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = Path(dir_name, "workload.toml")
+        filepath.write_text(CONFIG_TOML)
+        config = WorkloadConfig.from_file(filepath)
+
+    names = ["mrn", "visit_observation", "hospital_visit"]
+
+    assert config.rate("visit_observation", "insert", names) == 50.0
+    assert config.rate("hospital_visit", "insert", names) == 1.0
+    assert config.rate("hospital_visit", "delete", names, default=0.5) == 0.5
+
+    # Total update rate is shared by weight between tables without a defined rate
+    assert config.rate("mrn", "update", names) == 0.0
+    assert config.rate("visit_observation", "update", names) == 8.0
+    assert config.rate("hospital_visit", "update", names) == 4.0
+
+    assert config.max_num_rows("visit_observation", default=1e8) == 1000
+    assert config.max_num_rows("mrn", default=1e8) == 100
+
+
+def test_tables_with_zero_weight_share_none_of_the_total():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = Path(dir_name, "workload.toml")
+        filepath.write_text(
+            "[totals]\nupdate_rate = 12.0\n\n"
+            "[tables.mrn]\nupdate_weight = 0\n\n"
+            "[tables.hospital_visit]\nupdate_weight = 0.0\n"
+        )
+        config = WorkloadConfig.from_file(filepath)
+
+    assert config.rate("mrn", "update", ["mrn", "hospital_visit", "location"]) == 0.0
+    assert config.rate("location", "update", ["mrn", "location"]) == 12.0
+    assert config.rate("mrn", "update", ["mrn", "hospital_visit"]) == 0.0
@@ -0,0 +1,92 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import csv
+import pytest
+import tempfile
+
+from pathlib import Path
+
+from satellite._column import Column
+from satellite._export import export_table
+from satellite._tables import Table
+from satellite.main import star
+
+
+def _table(name: str, n_rows: int) -> Table:
+    table = Table(name=name)
+    table.n_rows = n_rows
+    for name, java_type in ((f"{name}_id", "Long"), ("photo", "byte[]")):
+        table._data[Column(name, java_type, parent_table_name=table.name)] = []
+
+    return table
+
+
+def test_csv_export_includes_primary_keys_and_foreign_keys():
+
+    room = _table("room", n_rows=3)
+    bed = _table("bed", n_rows=5)
+    room_id = Column("room_id", "Long", parent_table_name="bed", table_reference=room)
+    bed._data[room_id] = []
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = export_table(bed, Path(dir_name), "csv", chunk_size=2)
+        assert filepath.name == "bed.csv"
+
+        with open(filepath, newline="") as file:
+            rows = list(csv.DictReader(file))
+
+    assert [int(row["bed_id"]) for row in rows] == [1, 2, 3, 4, 5]
+    assert all(1 <= int(row["room_id"]) <= 3 for row in rows)
+
+    photos = bed.fake_chunk(first_row=0, n_rows=5)[bed.columns[1]]
+    assert [row["photo"] for row in rows] == ["\\x" + p.hex() for p in photos]
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_parquet_export_round_trips_types_and_nulls(compression: str):
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    tables = star.tables.copy()
+    for table in tables:
+        table.n_rows = 0
+    table = tables.named("visit_observation")
+    table.n_rows = 50
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = export_table(table, Path(dir_name), "parquet", compression, 20)
+        assert filepath.name == "visit_observation.parquet"
+
+        parquet_file = pq.ParquetFile(filepath)
+        data = parquet_file.read()
+
+    assert parquet_file.metadata.num_row_groups == 3
+    types = {field.name: str(field.type) for field in data.schema}
+    assert types["visit_observation_id"] == "int64"
+    assert types["observation_datetime"] == "timestamp[us, tz=UTC]"
+    assert types["value_as_real"] == "float"
+    assert types["value_as_date"] == "date32[day]"
+
+    rows = data.to_pylist()
+    assert [row["visit_observation_id"] for row in rows] == list(range(1, 51))
+    assert all(row["observation_datetime"].tzinfo is not None for row in rows)
+
+    # Each observation has exactly one of its values defined
+    values = ("value_as_text", "value_as_real", "value_as_date")
+    assert all(sum(row[v] is not None for v in values) == 1 for row in rows)
+    for name in values:
+        assert any(row[name] is None for row in rows)
+
+    expected = table.fake_chunk(first_row=0, n_rows=20)
+    column = next(c for c in table.columns if c.name == "value_as_date")
+    assert [row["value_as_date"] for row in rows[:20]] == expected[column]
@@ -0,0 +1,79 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+import tempfile
+
+from pathlib import Path
+from satellite._fake import _Faker
+
+
+def test_pooled_values_are_persisted():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        pool_path = str(Path(dir_name, "pools.json"))
+
+        _fake = _Faker(pool_size=20, pool_path=pool_path)
+        assert _fake.has_pools
+
+        pooled_lastname = _fake.pooled(_fake.lastname)
+        initial_values = list(pooled_lastname.values)
+        assert len(initial_values) == 20
+
+        sampled_values = {pooled_lastname() for _ in range(100)}
+        assert len(sampled_values) > 1
+
+        # Pools are loaded from the file rather than generated again
+        other_fake = _Faker(pool_size=20, pool_path=pool_path)
+        assert other_fake.pooled(other_fake.lastname).values == initial_values
+
+
+def test_pools_are_resized_and_saved_only_when_changed(tmp_path):
+
+    pool_path = tmp_path / "pools.json"
+    _fake = _Faker(pool_size=10, pool_path=str(pool_path))
+    values = list(_fake.pooled(_fake.bytea).values)
+    assert all(isinstance(value, bytes) for value in values)
+
+    modified_time = pool_path.stat().st_mtime_ns
+    _Faker(pool_size=10, pool_path=str(pool_path)).pooled(_fake.bytea)
+    assert pool_path.stat().st_mtime_ns == modified_time  # Loaded, not saved
+
+    smaller_fake = _Faker(pool_size=5, pool_path=str(pool_path))
+    assert smaller_fake.pooled(smaller_fake.bytea).values == values[:5]
+
+    larger_fake = _Faker(pool_size=15, pool_path=str(pool_path))
+    larger_values = larger_fake.pooled(larger_fake.bytea).values
+    assert len(larger_values) == 15 and larger_values[:5] == values[:5]
+    assert [p.name for p in tmp_path.iterdir()] == ["pools.json"]  # No temp files
+
+
+def test_identifiers_are_not_pooled():
+
+    _fake = _Faker(pool_size=5)
+    assert _fake.pooled(_fake.mrn) == _fake.mrn
+    assert len({_fake.pooled(_fake.encounter)() for _ in range(50)}) > 5
+
+
+@pytest.mark.parametrize("table_name", ["hospital_visit", "visit_observation"])
+def test_batch_methods_match_row_methods(table_name: str):
+
+    _fake = _Faker()
+
+    _fake.seed_instance(1)
+    rows = [getattr(_fake, table_name)() for _ in range(50)]
+
+    _fake.seed_instance(1)
+    data = getattr(_fake, f"{table_name}_batch")(50)
+
+    assert data == {name: [row[name] for row in rows] for name in rows[0]}
@@ -0,0 +1,43 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import pytest
+
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from satellite._health import serve_health
+
+
+def test_health_endpoint_serves_the_current_state():
+
+    state = {"running": True, "n_operations": 1}
+    server = serve_health(0, lambda: dict(state))
+    url = f"http://localhost:{server.server_port}"
+
+    try:
+        with urlopen(f"{url}/health") as response:
+            assert response.status == 200
+            assert json.loads(response.read()) == state
+
+        state["running"] = False
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"{url}/health")
+        assert error.value.code == 503
+
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"{url}/other")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
@@ -0,0 +1,38 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import gzip
+import pytest
+import tempfile
+
+from pathlib import Path
+from satellite._output import open_output, suffix_for
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_output_is_written_in_full(compression: str):
+
+    lines = [f"INSERT INTO star.table VALUES ({i});" for i in range(10_000)]
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = Path(dir_name, f"table.sql{suffix_for(compression)}")
+
+        with open_output(filepath, compression) as file:
+            for line in lines:
+                print(line, file=file)
+
+        if compression == "gzip":
+            text = gzip.decompress(filepath.read_bytes()).decode()
+        else:
+            text = filepath.read_text()
+        assert text.splitlines() == lines
@@ -0,0 +1,57 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import signal
+
+from time import sleep
+
+from satellite._profile import Profile, phase, timed, timers
+
+
+@timed("waiting")
+def _wait() -> None:
+    with phase("sleeping"):
+        sleep(0.02)
+
+
+def test_phases_are_only_timed_within_a_profile(tmp_path):
+
+    _wait()
+    assert "waiting" not in timers.totals
+
+    handler = signal.getsignal(signal.SIGTERM)
+    profile = Profile(tmp_path / "profile.folded", profiler="sample", interval=0.001)
+    profile.start()
+    _wait()
+    _wait()
+    profile.stop()
+    assert signal.getsignal(signal.SIGTERM) is handler
+
+    assert timers.n_calls["waiting"] == timers.n_calls["sleeping"] == 2
+    assert timers.totals["waiting"] >= timers.totals["sleeping"] >= 0.04
+
+    lines = (tmp_path / "profile.folded").read_text().splitlines()
+    assert any("_wait (test_profile.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", maxsplit=1)
+    assert int(count) > 0 and ";" in stack
+
+
+def test_each_profile_times_its_own_phases(tmp_path):
+
+    for _ in range(2):
+        profile = Profile(tmp_path / "profile.prof", profiler="cprofile")
+        profile.start()
+        _wait()
+        profile.stop()
+
+        assert timers.n_calls["waiting"] == 1
@@ -0,0 +1,84 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from types import SimpleNamespace
+from psycopg2.pool import PoolError
+
+from satellite._reads import LatencyHistogram, ReadWorkload, read_queries_for
+from satellite.main import star
+
+
+def test_read_queries_follow_the_foreign_keys():
+
+    queries = {query.name: query for query in read_queries_for("star", star.tables)}
+    n_foreign_keys = sum(len(table.foreign_key_columns) for table in star.tables)
+    assert len(queries) == len(star.tables) + 2 * n_foreign_keys
+
+    query = queries["hospital_visit -> mrn"]
+    assert query.table.name == "hospital_visit"
+    assert "child.mrn_id = parent.mrn_id" in query.sql
+    assert query.sql.endswith("WHERE child.hospital_visit_id = %s")
+
+    query = queries["mrn <- hospital_visit"]
+    assert query.table.name == "mrn"
+    assert query.sql.endswith("WHERE parent.mrn_id = %s LIMIT 100")
+
+    queries = read_queries_for("star", star.tables, child_limit=5)
+    assert all(
+        query.sql.endswith("LIMIT 5") for query in queries if " <- " in query.name
+    )
+
+
+def test_latency_percentiles_are_within_five_percent():
+
+    histogram, other = LatencyHistogram(), LatencyHistogram()
+    for i in range(1, 1001):
+        (histogram if i % 2 == 0 else other).add(i / 1000)
+    histogram.merge(other)
+
+    assert histogram.n == 1000 and histogram.max == 1.0
+    for q in (50, 95, 99):
+        assert histogram.percentile(q) == pytest.approx(q / 100, rel=0.05)
+    assert histogram.percentile(100) == 1.0
+
+
+class _ExhaustedPool:
+    def __init__(self, workload: ReadWorkload):
+        self._workload = workload
+        self.n_gets = 0
+
+    def getconn(self):
+        self.n_gets += 1
+        if self.n_gets == 3:
+            self._workload._stop.set()
+        raise PoolError("connection pool exhausted")
+
+    def putconn(self, *args, **kwargs):
+        raise AssertionError("No connection was taken from the pool")
+
+
+def test_pool_errors_are_counted_and_reading_continues():
+
+    tables = star.tables.copy()
+    for table in tables:
+        table.n_rows = 10
+    schema = SimpleNamespace(schema_name="star", tables=tables)
+    workload = ReadWorkload(schema)  # type: ignore
+    pool = _ExhaustedPool(workload)
+
+    workload._read(pool, index=0)  # type: ignore
+
+    assert pool.n_gets == 3
+    assert sum(workload.n_errors.values()) == 3
@@ -0,0 +1,86 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import tempfile
+
+from datetime import date, datetime, timezone
+from pathlib import Path
+from satellite._replay import OperationLog, read_operations
+
+
+def test_operation_log_round_trip():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = Path(dir_name, "operations.log")
+
+        log = OperationLog(filepath)
+        for i in range(2500):
+            log.record("insert", "mrn", i, ("12345", datetime(2023, 1, 1), None))
+        log.record("delete", "mrn", 3)
+        log.close()
+
+        operations = list(read_operations(filepath))
+
+    assert len(operations) == 2501
+    assert operations[-1].operation == "delete" and operations[-1].values == ()
+    assert operations[1000].id == 1000
+    assert operations[1000].values == ("12345", datetime(2023, 1, 1), None)
+    assert all(a.time <= b.time for a, b in zip(operations, operations[1:]))
+
+
+def test_operation_log_values_are_restored_with_their_types():
+
+    values = (
+        "text",
+        1,
+        0.5,
+        True,
+        None,
+        datetime(2023, 1, 1, 12, 30, tzinfo=timezone.utc),
+        date(2023, 1, 2),
+        b"\x00\xff",
+    )
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = Path(dir_name, "operations.log")
+
+        log = OperationLog(filepath)
+        log.record("update", "location", 1, values)
+        log.close()
+
+        (operation,) = read_operations(filepath)
+
+    assert operation.values == values
+    assert [type(value) for value in operation.values] == [type(v) for v in values]
+
+
+def test_updates_of_some_columns_record_their_names():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        filepath = Path(dir_name, "operations.log")
+
+        log = OperationLog(filepath)
+        log.record("update", "hospital_visit", 1, (datetime(2023, 1, 1),))
+        log.record(
+            "update",
+            "hospital_visit",
+            2,
+            (datetime(2023, 1, 2),),
+            columns=("discharge_datetime",),
+        )
+        log.close()
+
+        first, second = read_operations(filepath)
+
+    assert first.columns == ()
+    assert second.columns == ("discharge_datetime",)
+    assert second.values == (datetime(2023, 1, 2),)
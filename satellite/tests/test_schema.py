@@ -13,6 +13,12 @@
 # limitations under the License.
 import pytest
 
+from datetime import datetime
+from satellite._clock import SimulatedClock, use_clock
+from satellite._fake import fake
+
+from satellite._schema import DatabaseSchema, _session_options
+from satellite._tables import Tables
 from satellite.main import star
 
 
@@ -24,3 +30,154 @@ def test_basic_properties_of_non_connected_schema():
 
     with pytest.raises(AssertionError):  # must be connected to update num rows
         star.update_num_rows_in_tables()
+
+
+def test_tables_for_a_bulk_load_have_no_constraints():
+
+    table = next(t for t in star.tables if any(c.is_foreign_key for c in t.columns))
+    command = star.empty_table_create_command_for(table, bulk=True)
+
+    assert command.startswith("CREATE UNLOGGED TABLE")
+    assert "PRIMARY KEY" not in command and "REFERENCES" not in command
+
+    command = star.bulk_load_finish_command_for(table)
+    assert f"ADD PRIMARY KEY ({table.primary_key_name})" in command
+    assert "SET LOGGED" in command
+
+
+def test_foreign_key_columns_are_indexed():
+
+    table = next(t for t in star.tables if len(t.foreign_key_columns) > 0)
+    commands = star.foreign_key_index_commands_for(table, concurrently=True)
+
+    assert len(commands) == len(table.foreign_key_columns)
+    for command, column in zip(commands, table.foreign_key_columns):
+        assert command.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS")
+        assert command.endswith(f"ON star.{table.name} ({column.name});")
+
+
+def test_session_options_are_configurable(monkeypatch):
+
+    monkeypatch.setenv("SYNCHRONOUS_COMMIT", "on")
+    monkeypatch.setenv("STATEMENT_TIMEOUT", "5000")
+    options = _session_options()
+
+    assert options["application_name"] == "satellite"
+    assert "-c synchronous_commit=on" in options["options"]
+    assert "-c statement_timeout=5000" in options["options"]
+
+
+def test_waiting_for_an_unreachable_schema_times_out():
+
+    schema = DatabaseSchema(
+        name="star",
+        tables=Tables(),
+        database_name="satellite_missing_database",
+        host="localhost",
+        username="satellite_missing_user",
+        password="",
+    )
+    assert not schema.wait_until_exists(timeout=0.5)
+    assert not schema.is_connected
+
+
+def test_invalid_foreign_key_indexes_are_rebuilt(database_schema):
+
+    database_schema.insert(database_schema.tables.named("mrn").fake_row())
+    database_schema.update_num_rows_in_tables()
+    for _ in range(2):  # Visits of the only mrn
+        database_schema.insert(
+            database_schema.tables.named("hospital_visit").fake_row()
+        )
+    database_schema.commit()
+
+    # A failed concurrent build leaves an invalid index
+    index_name = "satellite_test.hospital_visit_mrn_id_idx"
+    database_schema._connection.autocommit = True
+    database_schema._execute(f"DROP INDEX IF EXISTS {index_name};")
+    database_schema._execute(
+        "CREATE UNIQUE INDEX CONCURRENTLY hospital_visit_mrn_id_idx "
+        "ON satellite_test.hospital_visit (mrn_id);"
+    )
+    database_schema._connection.autocommit = False
+    assert database_schema._invalid_index_names() == ["hospital_visit_mrn_id_idx"]
+
+    database_schema.add_foreign_key_indexes()
+
+    assert database_schema._invalid_index_names() == []
+    assert database_schema._execute_and_fetch(
+        f"SELECT indisunique FROM pg_index WHERE indexrelid = '{index_name}'::regclass"
+    ) == (False,)
+
+
+def test_discharging_a_visit_keeps_the_rest_of_its_history(database_schema):
+
+    database_schema.insert(database_schema.tables.named("mrn").fake_row())
+    database_schema.update_num_rows_in_tables()
+    database_schema.insert(database_schema.tables.named("hospital_visit").fake_row())
+    database_schema.commit()
+    database_schema.update_num_rows_in_tables()
+
+    query = (
+        "SELECT presentation_datetime, admission_datetime, encounter, "
+        "discharge_datetime FROM satellite_test.hospital_visit"
+    )
+    before = database_schema._execute_and_fetch(query)
+
+    use_clock(SimulatedClock(start=datetime(2030, 1, 1)))
+    try:
+        row = database_schema.tables.named("hospital_visit").randomised_existing_row()
+        assert database_schema.update(row)
+    finally:
+        use_clock(None)
+
+    after = database_schema._execute_and_fetch(query)
+    assert after[:3] == before[:3]
+    assert after[3].year == 2030
+
+
+def test_live_ids_are_bounded_and_only_kept_for_referenced_tables(
+    database_schema, monkeypatch
+):
+
+    mrn = database_schema.tables.named("mrn")
+    for _ in range(50):
+        database_schema.insert(mrn.fake_row())
+    database_schema.commit()
+    database_schema.update_num_rows_in_tables()
+
+    database_schema.update_live_ids_in_tables()
+    assert len(mrn.live_ids) == 50
+    assert database_schema.tables.named("visit_observation").live_ids is None
+
+    monkeypatch.setenv("MAX_LIVE_IDS", "5")
+    database_schema.update_live_ids_in_tables(partition=(1, 2))
+    assert 0 < len(mrn.live_ids) <= 5
+    assert all(1 <= mrn.live_ids.sample(fake) <= 50 for _ in range(20))
+    assert all(mrn.live_ids.sample(fake) % 2 == 1 for _ in range(20))
+
+
+def test_chunks_reference_present_rows_and_report_failures(database_schema):
+
+    mrn = database_schema.tables.named("mrn")
+    hospital_visit = database_schema.tables.named("hospital_visit")
+    mrn.n_rows = 20
+    assert database_schema.insert_chunk(mrn.fake_chunk(first_row=0, n_rows=20))
+    database_schema._execute_and_commit(
+        "DELETE FROM satellite_test.mrn WHERE mrn_id <= 10"
+    )
+
+    # Keys 1...n_rows are assumed without live keys, so deleted rows are referenced
+    hospital_visit.n_rows = 20
+    assert not database_schema.insert_chunk(
+        hospital_visit.fake_chunk(first_row=0, n_rows=20)
+    )
+    assert database_schema.n_failures == {"hospital_visit": 1}
+
+    database_schema.update_num_rows_in_tables()
+    database_schema.update_live_ids_in_tables()
+    chunk = hospital_visit.fake_chunk(first_row=0, n_rows=20)
+    assert database_schema.insert_chunk(chunk)
+
+    mrn_id = next(c for c in hospital_visit.columns if c.name == "mrn_id")
+    assert all(_id > 10 for _id in chunk[mrn_id])
@@ -0,0 +1,58 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+from satellite._column import Column
+from satellite._server_side import ServerSideGenerator
+from satellite._tables import Table
+
+
+def _patient_table() -> Table:
+    table = Table(name="patient")
+    table.n_rows = 5
+    for name, java_type in (("patient_id", "Long"), ("sex", "String")):
+        table._data[Column(name, java_type, parent_table_name=table.name)] = []
+
+    lastname = Column("lastname", "String", parent_table_name=table.name)
+    table._data[lastname] = []
+    return table
+
+
+def test_insert_commands_generate_from_series():
+
+    table = _patient_table()
+    generator = ServerSideGenerator(schema_name="star")
+
+    commands = list(generator.insert_commands_for(table, chunk_size=2))
+    assert len(commands) == 3
+    assert "generate_series(1, 1)" in commands[-1]
+    assert commands == list(generator.insert_commands_for(table, chunk_size=2))
+
+    command = commands[0]
+    assert command.startswith("SELECT setseed(")
+    assert "INSERT INTO star.patient (sex, lastname)" in command
+    assert "patient_id" not in command
+    assert "'UNKNOWN', 'M', 'F'" in command  # Compiled from the sex provider
+
+
+def test_python_only_providers_are_looked_up():
+
+    table = _patient_table()
+    generator = ServerSideGenerator(schema_name="star", lookup_size=3)
+
+    create_table, insert = generator.lookup_create_commands([table])
+    assert create_table.startswith("CREATE TABLE star.satellite_lookup")
+    assert insert.count("('lastname', ") == 3
+
+    command = generator.insert_command_for(table, n_rows=10)
+    assert "provider = 'lastname' AND idx = row_variables.i_lastname" in command
+    assert "floor(random() * 3)::int AS i_lastname" in command
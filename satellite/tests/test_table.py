@@ -12,9 +12,15 @@
 #  See the License for the specific language governing permissions and
 # limitations under the License.
 import tempfile
+import pytest
 
 from pathlib import Path
-from satellite._tables import Table
+from datetime import datetime
+from satellite import _tables
+from satellite._clock import SimulatedClock, use_clock
+from satellite._fake import fake
+from satellite._tables import LiveIds, Table, Tables
+from satellite.main import star
 
 
 MINIMAL_TABLE_JAVA_FILE_LINES = (
@@ -63,3 +69,158 @@ def test_table_from_file():
 
         room_id_col = next(c for c in row.columns if c.name == "room_id")
         assert isinstance(row[room_id_col], int)
+
+
+def _bed_table(dir_name: str) -> Table:
+    filepath = Path(dir_name, "Bed.java")
+    with open(filepath, "w") as file:
+        print("\n".join(MINIMAL_TABLE_JAVA_FILE_LINES), file=file)
+
+    return Table.from_java_file(filepath)
+
+
+@pytest.mark.parametrize("n_rows_per_stream", [4, 1000])
+def test_fake_chunks_are_reproducible(monkeypatch, n_rows_per_stream: int):
+    monkeypatch.setattr(_tables, "N_ROWS_PER_STREAM", n_rows_per_stream)
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        table = _bed_table(dir_name)
+        column = next(c for c in table.columns if c.name == "hl7_string")
+
+        all_rows = table.fake_chunk(first_row=0, n_rows=10)
+        assert len(set(all_rows[column])) > 1
+
+        # Resuming from any row generates the same values, in any order
+        later_rows = table.fake_chunk(first_row=5, n_rows=5)
+        earlier_rows = table.fake_chunk(first_row=0, n_rows=5)
+        assert earlier_rows[column] + later_rows[column] == all_rows[column]
+
+
+def test_topological_levels():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        room_filepath = Path(dir_name, "Room.java")
+        with open(room_filepath, "w") as file:
+            print("public class Room {\n    private Long roomId;\n}", file=file)
+
+        tables = Tables([_bed_table(dir_name), Table.from_java_file(room_filepath)])
+        for table in tables:
+            table.assign_foreign_keys(tables)
+
+        levels = tables.topological_levels()
+        assert [[table.name for table in level] for level in levels] == [
+            ["room"],
+            ["bed"],
+        ]
+
+
+def test_live_ids_add_remove_and_sample():
+
+    ids = LiveIds(range(1, 6))
+    ids.remove(2)
+    ids.remove(2)
+    ids.add(7)
+    ids.add(7)
+
+    assert len(ids) == 5
+    assert 2 not in ids and 7 in ids
+    assert {ids.sample(fake) for _ in range(200)} == {1, 3, 4, 5, 7}
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        table = _bed_table(dir_name)
+
+    assert table.random_id() is None
+    table.n_rows = 3
+    assert table.random_id() in (1, 2, 3)
+
+    table.live_ids = LiveIds([10])
+    assert table.random_existing_row().id == 10
+
+    table.live_ids.remove(10)
+    assert table.random_id() is None
+
+
+def test_randomised_existing_rows_are_regenerated_in_place():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        table = _bed_table(dir_name)
+    table.n_rows = 10
+    column = next(c for c in table.columns if c.name == "hl7_string")
+
+    row = table.randomised_existing_row()
+    values = [row[column]]
+    for _ in range(5):
+        assert table.randomised_existing_row() is row
+        values.append(row[column])
+
+    assert len(set(values)) > 1
+    assert 1 <= row.id <= 10
+
+
+@pytest.mark.parametrize("table_name", ["hospital_visit", "visit_observation", "mrn"])
+def test_randomised_existing_rows_match_newly_generated_rows(table_name: str):
+
+    table = star.tables.copy().named(table_name)
+    table.n_rows = 100
+    assert table_name != "hospital_visit" or hasattr(fake, "hospital_visit_update")
+
+    def values(row) -> tuple:
+        return (row.id,) + tuple(tuple(values) for values in row._data.values())
+
+    # Both draw from the same state of the shared faker, which is then restored so
+    # later tests are unaffected
+    state = fake.random.getstate()
+    try:
+        expected = []
+        for _ in range(20):
+            row = table.random_existing_row()
+            row.add_fake_data(skip_foreign_keys=True)
+            expected.append(values(row))
+
+        fake.random.setstate(state)
+        generated = [values(table.randomised_existing_row()) for _ in range(20)]
+    finally:
+        fake.random.setstate(state)
+
+    assert generated == expected
+    assert len(set(generated)) == 20
+    assert fake.random.getstate() == state
+
+
+def test_visits_updated_with_a_clock_only_change_their_discharge_time():
+
+    table = star.tables.copy().named("hospital_visit")
+    table.n_rows = 10
+    names = [column.name for column in table.data_columns]
+    assert "admission_datetime" in names and "presentation_datetime" in names
+
+    use_clock(SimulatedClock(start=datetime(2023, 1, 1)))
+    try:
+        row = table.randomised_existing_row()
+        updated = {column.name: row[column] for column in row.updated_columns}
+    finally:
+        use_clock(None)
+
+    assert list(updated) == ["discharge_datetime"]
+    assert updated["discharge_datetime"] >= datetime(2023, 1, 1)
+    assert [column.name for column in row.updated_columns] == names
+
+
+def test_copied_tables_are_independent():
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        room_filepath = Path(dir_name, "Room.java")
+        with open(room_filepath, "w") as file:
+            print("public class Room {\n    private Long roomId;\n}", file=file)
+
+        tables = Tables([_bed_table(dir_name), Table.from_java_file(room_filepath)])
+        for table in tables:
+            table.assign_foreign_keys(tables)
+
+    copied = tables.copy()
+    copied.named("room").n_rows = 5
+
+    assert tables.named("room").n_rows == 0
+    room_id = next(c for c in copied.named("bed").columns if c.is_foreign_key)
+    assert room_id.table_reference is copied.named("room")
+    assert copied.named("bed").fake_row()[room_id] in range(1, 6)
@@ -0,0 +1,132 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import signal
+import pytest
+import threading
+import multiprocessing
+
+from collections import Counter
+from time import monotonic, sleep
+from typing import Any, List, Optional, Tuple
+
+from satellite._fake import fake
+from satellite._workers import run_workers
+from satellite._workload import Workload
+
+
+class _CountingWorkload:
+    def __init__(self, partition: Tuple[int, int], metrics: Any):
+        self._partition = partition
+        self._metrics = metrics
+
+    def run(self, duration: Optional[float]) -> None:
+        index, n_partitions = self._partition
+        n_operations = Counter({("insert", "mrn"): index + 1})
+        n_operations[("seed", str(fake.random.random()))] = 1
+        self._metrics.put((index, n_operations, dict()))
+
+
+def test_metrics_of_workers_are_aggregated():
+
+    total = run_workers(3, _CountingWorkload, report_interval=0.1)
+    assert total[("insert", "mrn")] == 1 + 2 + 3
+
+    seeds = [key for key in total if key[0] == "seed"]
+    assert len(seeds) == 3  # Each worker has its own faker seed
+
+
+class _FailingWorkload(_CountingWorkload):
+    def run(self, duration: Optional[float]) -> None:
+        if self._partition[0] == 1:
+            raise RuntimeError("Worker failed")
+        sleep(60)  # Other workers run until they are stopped
+
+
+def test_a_failing_worker_stops_the_run():
+
+    start_time = monotonic()
+    with pytest.raises(RuntimeError, match="exit codes {1: 1}"):
+        run_workers(3, _FailingWorkload, report_interval=0.1)
+
+    assert monotonic() - start_time < 30
+
+
+class _PartitionWorkload(_CountingWorkload):
+    def run(self, duration: Optional[float]) -> None:
+        workload = Workload(schemas=[], streams=[], partition=self._partition)
+        index = self._partition[0]
+        ids = Counter(
+            {(index, _id): 1 for _id in range(1, 101) if workload._in_partition(_id)}
+        )
+        self._metrics.put((index, ids, dict()))
+
+
+def test_workers_partition_the_primary_keys():
+
+    total = run_workers(3, _PartitionWorkload, report_interval=0.1)
+
+    assert all(_id % 3 == index for index, _id in total)
+    assert sorted(_id for _, _id in total) == list(range(1, 101))  # Each in one
+
+
+class _SlowWorkload(_CountingWorkload):
+    def run(self, duration: Optional[float]) -> None:
+        sleep(1.5 * (self._partition[0] + 1))
+
+
+class _RecordingState(dict):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n_alive_when_running: List[int] = []
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        if self["running"]:
+            self.n_alive_when_running.append(self["n_workers"])
+
+
+def test_run_is_not_running_once_a_worker_has_exited():
+
+    state = _RecordingState()
+    run_workers(2, _SlowWorkload, report_interval=0.1, state=state)
+
+    assert not state["running"]
+    assert len(state.n_alive_when_running) > 0
+    assert all(n_alive == 2 for n_alive in state.n_alive_when_running)
+
+
+class _SleepingWorkload(_CountingWorkload):
+    def run(self, duration: Optional[float]) -> None:
+        sleep(60)
+
+
+def test_terminating_the_run_stops_the_workers():
+
+    workers: List[Any] = []
+
+    def terminate() -> None:
+        workers.extend(multiprocessing.active_children())
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    handler = signal.getsignal(signal.SIGTERM)
+    timer = threading.Timer(1.0, terminate)
+    timer.start()
+    with pytest.raises(SystemExit):
+        run_workers(2, _SleepingWorkload, report_interval=0.1)
+    timer.join()
+
+    assert len(workers) == 2
+    assert not any(worker.is_alive() for worker in workers)
+    assert signal.getsignal(signal.SIGTERM) is handler
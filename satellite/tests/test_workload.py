@@ -0,0 +1,98 @@
+#  Copyright (c) University College London Hospitals NHS Foundation Trust
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+import pytest
+
+from satellite._schema import INSERT
+from satellite._tables import LiveIds
+from satellite._workload import Workload, _Stream
+
+
+def _insert_workload(schema, table_names, **kwargs) -> Workload:
+    streams = [
+        _Stream(schema, schema.tables.named(name), INSERT, rate=1, max_num_rows=1e9)
+        for name in table_names
+    ]
+    return Workload([schema], streams, **kwargs)
+
+
+def test_random_transaction_sizes_have_the_configured_mean():
+
+    workload = Workload([], [], transaction_size=20, transaction_shape="random")
+    sizes = [workload._next_transaction_size() for _ in range(20000)]
+
+    assert min(sizes) >= 1 and len(set(sizes)) > 10
+    assert sum(sizes) / len(sizes) == pytest.approx(20, rel=0.05)
+
+
+@pytest.mark.parametrize("n_operations, size", [(10, 4), (8, 4), (5, 1)])
+def test_operations_are_committed_in_fixed_size_transactions(
+    database_schema, monkeypatch, n_operations: int, size: int
+):
+    n_commits = 0
+    commit = database_schema.commit
+
+    def counted_commit() -> None:
+        nonlocal n_commits
+        n_commits += 1
+        commit()
+
+    monkeypatch.setattr(database_schema, "commit", counted_commit)
+    workload = _insert_workload(database_schema, ["mrn"], transaction_size=size)
+    for _ in range(n_operations):
+        workload._execute(workload._streams[0])
+    workload._commit()
+
+    assert n_commits == (0 if size == 1 else math.ceil(n_operations / size))
+    database_schema.update_num_rows_in_tables()
+    assert database_schema.tables.named("mrn").n_rows == n_operations
+
+
+def test_a_failed_operation_does_not_lose_its_transaction(database_schema):
+
+    workload = _insert_workload(
+        database_schema, ["mrn", "hospital_visit"], transaction_size=3
+    )
+    mrn_stream, hospital_visit_stream = workload._streams
+
+    workload._execute(mrn_stream)
+    mrn_stream.table.live_ids = LiveIds([10**9])  # Referenced but does not exist
+    workload._execute(hospital_visit_stream)
+    workload._execute(mrn_stream)
+    assert not database_schema.in_transaction  # Committed after 3 operations
+
+    database_schema.update_num_rows_in_tables()
+    assert database_schema.tables.named("mrn").n_rows == 2
+    assert database_schema.tables.named("hospital_visit").n_rows == 0
+    assert database_schema.n_failures == {"hospital_visit": 1}
+
+
+def test_publications_include_recreated_tables(database_schema):
+    def published_tables() -> set:
+        database_schema._execute(
+            "SELECT tablename FROM pg_publication_tables "
+            "WHERE pubname = 'satellite_test' AND schemaname = 'satellite_test'"
+        )
+        return {name for (name,) in database_schema._cursor.fetchall()}
+
+    all_tables = {table.name for table in database_schema.tables}
+    database_schema.create_publication("satellite_test")
+    assert published_tables() == all_tables
+
+    database_schema.recreate()  # Drops the tables from the publication
+    assert published_tables() == set()
+
+    database_schema.create_publication("satellite_test")
+    assert published_tables() == all_tables
+    database_schema.create_publication("satellite_test")  # Nothing to add